@@ -0,0 +1,224 @@
+"""
+Asyncio LLM execution engine — runs many tasks in one event loop with a single pooled client.
+Concurrency adapts to observed 429/529 responses (AIMD) and to optional request/token-per-minute budgets.
+Server errors, dropped connections and timeouts are retried too, but don't lower the limit.
+"""
+import asyncio
+import importlib
+import time
+from collections import deque
+
+from anthropic import APIConnectionError, APIStatusError
+
+import fingerprints
+import llm_backends
+import rate_limit
+import sections
+import telemetry
+from continuation import Continuation
+from prompt_budget import estimate_tokens
+from response_cache import cache_key, open_cache
+
+runner = importlib.import_module('run-task')
+
+WINDOW = 60.0  # seconds — rate budgets are expressed per minute
+DECREASE_COOLDOWN = 5.0  # seconds — a burst of 429s from one overload only halves the limit once
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that grows additively on success and halves on throttling.
+
+    Optional rpm/tpm budgets are enforced over a sliding one-minute window; token
+    reservations use an estimate up front and are corrected with actual usage.
+    """
+
+    def __init__(self, initial=2, minimum=1, maximum=16, rpm=None, tpm=None):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.rpm = rpm
+        self.tpm = tpm
+        self.in_use = 0
+        self.throttle_events = 0
+        self._last_decrease = float('-inf')
+        self._cond = asyncio.Condition()
+        self._requests = deque()  # timestamps
+        self._tokens = deque()    # (timestamp, tokens)
+
+    def _prune(self, now):
+        while self._requests and now - self._requests[0] >= WINDOW:
+            self._requests.popleft()
+        while self._tokens and now - self._tokens[0][0] >= WINDOW:
+            self._tokens.popleft()
+
+    def _budget_wait(self, tokens):
+        """Seconds until a request of this size fits in the rpm/tpm budgets (0 if it fits now)."""
+        now = time.monotonic()
+        self._prune(now)
+        wait = 0.0
+        if self.rpm and len(self._requests) >= self.rpm:
+            wait = max(wait, WINDOW - (now - self._requests[0]))
+        if self.tpm and self._tokens:
+            used = sum(t for _, t in self._tokens)
+            if used + tokens > self.tpm:
+                wait = max(wait, WINDOW - (now - self._tokens[0][0]))
+        return wait
+
+    async def acquire(self, tokens=0):
+        async with self._cond:
+            while True:
+                wait = self._budget_wait(tokens)
+                if self.in_use < int(self.limit) and wait == 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=wait or None)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_use += 1
+            now = time.monotonic()
+            self._requests.append(now)
+            if tokens:
+                self._tokens.append((now, tokens))
+
+    async def release(self, throttled=False, token_correction=0):
+        async with self._cond:
+            self.in_use -= 1
+            if throttled:
+                self.throttle_events += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= DECREASE_COOLDOWN:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if token_correction:
+                self._tokens.append((time.monotonic(), token_correction))
+            self._cond.notify_all()
+
+
+class AsyncEngine:
+    """Owns the pooled async client (see llm_backends) and the shared limiter."""
+
+    def __init__(self, limiter, client=None, cache=None):
+        self.limiter = limiter
+        self._client = client
+        self.cache = cache
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Retries are handled here so that throttling is visible to the limiter
+            self._client = llm_backends.get_async_client()
+        return self._client
+
+    async def make_request(self, prompt, messages, estimated_tokens, model=runner.MODEL, max_tokens=runner.MAX_TOKENS):
+        recorder = telemetry.current()
+        coordinator = rate_limit.get_coordinator()
+        retries = len(runner.RETRY_DELAYS)
+        for attempt in range(1, retries + 2):
+            queued_since = time.monotonic()
+            while wait := coordinator.try_acquire():
+                await asyncio.sleep(wait)
+            await self.limiter.acquire(estimated_tokens)
+            queued = time.monotonic() - queued_since
+            started = time.monotonic()
+            try:
+                response = await self.client.messages.create(
+                    model=model,
+                    max_tokens=max_tokens,
+                    **runner.request_params(prompt, messages)
+                )
+            except (APIStatusError, APIConnectionError) as e:
+                kind, outcome = runner.retry_kind(e), runner.attempt_outcome(e)
+                await self.limiter.release(throttled=kind == 'throttled')
+                if not kind or attempt > retries:
+                    recorder.attempt(time.monotonic() - started, outcome, queued=queued)
+                    raise
+                delay = rate_limit.backoff_delay(
+                    attempt, e, runner.RETRY_DELAYS if kind == 'throttled' else runner.TRANSIENT_DELAYS)
+                recorder.attempt(time.monotonic() - started, outcome, round(delay, 1), queued=queued)
+                if kind == 'throttled':
+                    print(f"⏳ Throttled (attempt {attempt}/{retries}), "
+                          f"limit now {int(self.limiter.limit)}, waiting {delay:.0f}s...")
+                    coordinator.pause(delay)
+                else:
+                    print(f"⚠️  Request failed ({outcome}, attempt {attempt}/{retries}), retrying in {delay:.0f}s...")
+                    await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                await self.limiter.release()
+                raise
+            recorder.attempt(time.monotonic() - started, queued=queued)
+            usage = response.usage
+            actual = usage.input_tokens + usage.output_tokens
+            await self.limiter.release(token_correction=actual - estimated_tokens)
+            return response
+
+    async def call_agent(self, agent, prompt, model=runner.MODEL, max_tokens=runner.MAX_TOKENS):
+        """Async counterpart of run-task's call_agent, including the continuation loop."""
+        print(f"🤖 Calling {agent} agent ({model}, async)...")
+        prompt_tokens = estimate_tokens(runner.prompt_text(prompt))
+        continuation = Continuation()
+        while True:
+            estimated = prompt_tokens + estimate_tokens(continuation.output)
+            response = await self.make_request(prompt, continuation.messages(), estimated, model, max_tokens)
+            runner.note_response(response)
+            if not continuation.add(response, response.content[0].text):
+                return continuation.output
+
+    async def call_agent_sections(self, agent, prompt, section_names, model=runner.MODEL,
+                                  max_tokens=runner.MAX_TOKENS):
+        """Async counterpart of run-task's call_agent_sections."""
+        print(f"🧩 Generating {agent} output in {len(section_names)} sections (async)")
+        prompts = sections.section_prompts(prompt, section_names)
+        # The first request writes the shared prefix to the prompt cache; the rest read it
+        first = await self.call_agent(agent, prompts[0], model, max_tokens)
+        rest = await asyncio.gather(*(self.call_agent(agent, p, model, max_tokens) for p in prompts[1:]))
+        return sections.stitch([first, *rest])
+
+    async def run_task(self, task):
+        """Run one task end-to-end. Returns True on success."""
+        task_id, agent = task['id'], task['agent']
+        task_input = task.get('input', {})
+        model, max_tokens = runner.task_route(task)
+        try:
+            with telemetry.record_task(task_id, agent, task_input, model) as recorder:
+                started = time.monotonic()
+                # Off the loop: prompt assembly may call the API to summarize an oversized input
+                prompt = await asyncio.to_thread(runner.load_agent_prompt, agent, task_input)
+                fingerprint = fingerprints.compute(agent, task_input, model)
+                recorder.prompt_built(time.monotonic() - started)
+                output_path = runner.get_output_path(agent, task_input, task_output_path=task.get('output_path'))
+                section_names = task.get('sections')
+                issues = []
+                for attempt in range(runner.VALIDATION_RETRIES + 1):
+                    if attempt:
+                        print(f"🔁 Regenerating {task_id} with the validation feedback (attempt {attempt + 1})")
+                        prompt, issues = runner.with_feedback(prompt, issues), []
+                        recorder.set(truncated=False, validation_retries=attempt)
+                    key = cache_key(runner.prompt_text(prompt), model, max_tokens)
+                    cached = self.cache.get(key) if self.cache else None
+                    if cached is not None:
+                        print(f"♻️  Cache hit for {task_id} ({key[:12]}), skipping LLM call")
+                        recorder.set(cache_hit=True, output_chars=len(cached))
+                        # Off the loop too: escalated validation calls the LLM judge synchronously
+                        passed = await asyncio.to_thread(runner.finish_task, task_id, agent, output_path, cached,
+                                                         fingerprint, section_names, issues)
+                    else:
+                        if section_names:
+                            output = await self.call_agent_sections(agent, prompt, section_names, model, max_tokens)
+                            recorder.set(sections=len(section_names))
+                        else:
+                            output = await self.call_agent(agent, prompt, model, max_tokens)
+                        recorder.set(output_chars=len(output))
+                        passed = await asyncio.to_thread(runner.finish_task, task_id, agent, output_path, output,
+                                                         fingerprint, section_names, issues)
+                        if passed and self.cache:
+                            self.cache.put(key, output)
+                    if passed:
+                        break
+                recorder.set(status='completed' if passed else 'failed')
+                return passed
+        except Exception as e:
+            print(f"❌ Task {task_id} raised {type(e).__name__}: {e}")
+            return False
@@ -0,0 +1,219 @@
+"""
+Message Batches execution mode — submits a whole task list as one batch instead of one job per task.
+Used for wide, non-interactive fan-out (feature-breakdown, engineering-specs, post-foundation-reviews).
+
+The batch id and its task list are persisted under docs/.state/batches/ so an interrupted run
+resumes polling the existing batch rather than paying for a second submission.
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import fingerprints
+import sections
+import speculation
+import telemetry
+from response_cache import cache_key, open_cache
+
+runner = importlib.import_module('run-task')
+
+BATCH_DIR = Path('docs/.state/batches')
+
+
+def custom_id(task_id):
+    """Batch custom_ids must match ^[a-zA-Z0-9_-]{1,64}$."""
+    return re.sub(r'[^a-zA-Z0-9_-]', '_', task_id)[:64]
+
+
+def save_record(record):
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    path = BATCH_DIR / f"{record['batch_id']}.json"
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(record, f, indent=2)
+    os.replace(tmp, path)
+
+
+def pending_records():
+    if not BATCH_DIR.exists():
+        return []
+    records = []
+    for path in sorted(BATCH_DIR.glob('*.json')):
+        with open(path) as f:
+            records.append(json.load(f))
+    return records
+
+
+def submit_batch(client, prompted_tasks):
+    """Submit (task, prompt) pairs as one message batch and persist the batch record. Returns the record."""
+    requests = []
+    entries = {}
+    for task, prompt in prompted_tasks:
+        cid = custom_id(task['id'])
+        model, max_tokens = runner.task_route(task)
+        # A task with sections is one request per section, stitched in collect_batch (see sections.py)
+        prompts = sections.section_prompts(prompt, task['sections']) if task.get('sections') else [prompt]
+        parts = [f"{cid[:60]}-s{i}" for i in range(len(prompts))] if task.get('sections') else [cid]
+        for part, part_prompt in zip(parts, prompts):
+            requests.append({
+                'custom_id': part,
+                'params': {'model': model, 'max_tokens': max_tokens, **runner.request_params(part_prompt)},
+            })
+        entries[cid] = {'task': task, 'cache_key': cache_key(runner.prompt_text(prompt), model, max_tokens),
+                        'fingerprint': fingerprints.compute(task['agent'], task.get('input', {}), model),
+                        'parts': parts}
+
+    batch = runner.with_retries(lambda: client.messages.batches.create(requests=requests))
+    record = {'batch_id': batch.id, 'submitted_at': time.time(), 'entries': entries}
+    save_record(record)
+    print(f"📦 Submitted batch {batch.id} with {len(requests)} request(s)")
+    return record
+
+
+def wait_for_batch(client, batch_id, poll_interval=60, timeout=None):
+    """Poll until the batch has ended. Returns False if timeout elapses first."""
+    started = time.monotonic()
+    while True:
+        batch = runner.with_retries(lambda: client.messages.batches.retrieve(batch_id))
+        if batch.processing_status == 'ended':
+            return True
+        counts = batch.request_counts
+        print(f"⏳ Batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded, "
+              f"{counts.errored} errored")
+        if timeout is not None and time.monotonic() - started >= timeout:
+            return False
+        time.sleep(poll_interval)
+
+
+def collect_batch(client, record, cache=None):
+    """Write every succeeded result through finish_task. Returns the ids of tasks that failed."""
+    results = {item.custom_id: item.result
+               for item in runner.with_retries(lambda: client.messages.batches.results(record['batch_id']))}
+    failed = []
+    for cid, entry in record['entries'].items():
+        task = entry['task']
+        parts = [results.get(part) for part in entry.get('parts', [cid])]
+        failure = next((result.type if result else 'missing' for result in parts
+                        if not result or result.type != 'succeeded'), None)
+        if failure:
+            print(f"❌ Task {task['id']} {failure} in batch")
+            failed.append(task['id'])
+            continue
+
+        model, max_tokens = runner.task_route(task)
+        with telemetry.record_task(task['id'], task['agent'], task.get('input'), model) as recorder:
+            recorder.set(batch_id=record['batch_id'])
+            outputs = []
+            for index, result in enumerate(parts):
+                message = result.message
+                runner.note_response(message, budgeted=False)
+                output = message.content[0].text
+                if message.stop_reason == 'max_tokens':
+                    print(f"⚠️  Batch output for {task['id']} truncated, continuing synchronously...")
+                    prompt = runner.load_agent_prompt(task['agent'], task.get('input', {}))
+                    if task.get('sections'):
+                        prompt = sections.section_prompts(prompt, task['sections'])[index]
+                    output = runner.call_agent(task['agent'], prompt, resume_from=output, model=model,
+                                               max_tokens=max_tokens)
+                outputs.append(output)
+            if task.get('sections'):
+                output = sections.stitch(outputs)
+                recorder.set(sections=len(parts))
+            recorder.set(output_chars=len(output))
+
+            output_path = runner.get_output_path(task['agent'], task.get('input', {}), task.get('output_path'))
+            # A rejected output is left for the next scheduler round to regenerate
+            if runner.finish_task(task['id'], task['agent'], output_path, output, entry.get('fingerprint'),
+                                  task.get('sections')):
+                if cache:
+                    cache.put(entry['cache_key'], output)
+            else:
+                recorder.set(status='failed')
+                failed.append(task['id'])
+
+    (BATCH_DIR / f"{record['batch_id']}.json").unlink(missing_ok=True)
+    return failed
+
+
+def run_batch(tasks, client=None, poll_interval=60, timeout=None, use_cache=None):
+    """Run tasks through the batch API. Returns the process exit code."""
+    client = client or runner.get_client()
+    cache = open_cache(use_cache)
+    task_ids = {task['id'] for task in tasks}
+
+    # Resume batches already submitted for these tasks by an earlier run
+    records = [r for r in pending_records()
+               if {e['task']['id'] for e in r['entries'].values()} & task_ids]
+    in_batch = {e['task']['id'] for r in records for e in r['entries'].values()}
+
+    to_submit = []
+    for task in tasks:
+        if task['id'] in in_batch:
+            continue
+        prompt = runner.load_agent_prompt(task['agent'], task.get('input', {}))
+        model, max_tokens = runner.task_route(task)
+        cached = cache.get(cache_key(runner.prompt_text(prompt), model, max_tokens)) if cache else None
+        if cached is not None:
+            print(f"♻️  Cache hit for {task['id']}, not adding it to the batch")
+            output_path = runner.get_output_path(task['agent'], task.get('input', {}), task.get('output_path'))
+            runner.finish_task(task['id'], task['agent'], output_path, cached,
+                               fingerprints.compute(task['agent'], task.get('input', {}), model),
+                               task.get('sections'))
+            continue
+        to_submit.append((task, prompt))
+
+    for record in records:
+        print(f"↩️  Resuming batch {record['batch_id']}")
+    if to_submit:
+        records.append(submit_batch(client, to_submit))
+
+    failed = []
+    for record in records:
+        if not wait_for_batch(client, record['batch_id'], poll_interval, timeout):
+            print(f"⏸  Batch {record['batch_id']} still processing — rerun to resume polling")
+            return 2
+        failed += collect_batch(client, record, cache)
+
+    if failed:
+        print(f"❌ {len(failed)} task(s) failed: {failed}")
+        return 1
+    print(f"✅ Batch run complete ({len(tasks)} task(s))")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run find-next-task's task list through the Message Batches API")
+    parser.add_argument('--batch', action='store_true', help='(accepted for run-task.py compatibility)')
+    parser.add_argument('--tasks-file', help='JSON task list; defaults to the TASKS_JSON env var')
+    parser.add_argument('--poll-interval', type=float, default=60, help='seconds between status checks')
+    parser.add_argument('--timeout', type=float, help='stop polling after this many seconds (resume later)')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', default=None,
+                        help='bypass the response cache (same as AGENT_CACHE=off)')
+    args = parser.parse_args(argv)
+
+    if args.tasks_file:
+        with open(args.tasks_file) as f:
+            tasks = json.load(f)
+    elif os.environ.get('TASKS_JSON'):
+        tasks = json.loads(os.environ['TASKS_JSON'])
+    else:
+        parser.error('no tasks: set TASKS_JSON or pass --tasks-file')
+
+    roots = {task.get('root') for task in tasks}
+    if len(roots) > 1:
+        parser.error(f"tasks from {len(roots)} projects: a batch covers one project, run one per --root")
+    if roots - {None}:
+        from projects import Project
+        os.chdir(Project.parse(roots.pop()).root)
+    tasks = speculation.without_promoted(tasks)
+
+    return run_batch(tasks, poll_interval=args.poll_interval, timeout=args.timeout, use_cache=args.use_cache)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
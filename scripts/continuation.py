@@ -0,0 +1,85 @@
+"""
+Continuation of outputs truncated at max_tokens.
+
+Each continuation re-sends the prompt, then the output so far as an assistant turn (one text
+block per earlier part), then asks the model to carry on. Cache breakpoints sit on the task's
+user turn (see run-task's request_params) and on the newest assistant block. Part N therefore
+reads everything part N-1 sent from the prompt cache, and only the newest chunk is billed as
+fresh input. The model also sees everything it has written, not just the last chunk.
+
+Input is tallied across parts. Once the uncached input spent on continuations passes
+AGENT_MAX_CONTINUATION_INPUT tokens, the output is returned as it is rather than paying for
+another re-send. That happens when the prefix can't be cached, e.g. below the minimum size.
+"""
+import os
+
+import telemetry
+
+MAX_CONTINUATIONS = 5
+CONTINUE_PROMPT = "Continue exactly where you left off. Do not repeat any content already written."
+DEFAULT_MAX_CONTINUATION_INPUT = 200_000  # tokens
+
+
+def max_continuation_input():
+    return int(os.environ.get('AGENT_MAX_CONTINUATION_INPUT', DEFAULT_MAX_CONTINUATION_INPUT))
+
+
+class Continuation:
+    """The parts of one generation so far, and the input tokens they have cost."""
+
+    def __init__(self, previous=""):
+        self.chunks = [previous] if previous else []
+        self.parts = 0
+        self.input_tokens = 0         # uncached input, all parts
+        self.cache_write_tokens = 0
+        self.cache_read_tokens = 0
+        self.continuation_input = 0   # uncached input + cache writes, continuation parts only
+        self.limit = max_continuation_input()
+
+    @property
+    def output(self):
+        return "".join(self.chunks)
+
+    def messages(self):
+        """Turns to append after the prompt for the next request ([] for the first part)."""
+        blocks = [{"type": "text", "text": chunk} for chunk in self.chunks if chunk]
+        if not blocks:
+            return []
+        blocks[-1]["cache_control"] = {"type": "ephemeral"}
+        return [
+            {"role": "assistant", "content": blocks},
+            {"role": "user", "content": CONTINUE_PROMPT}
+        ]
+
+    def add(self, response, chunk):
+        """Record one part. Returns True if the output was truncated and another part should be requested."""
+        usage = response.usage
+        written = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        self.input_tokens += usage.input_tokens
+        self.cache_write_tokens += written
+        self.cache_read_tokens += getattr(usage, 'cache_read_input_tokens', None) or 0
+        if self.chunks:
+            self.continuation_input += usage.input_tokens + written
+        self.chunks.append(chunk)
+        self.parts += 1
+
+        if response.stop_reason != "max_tokens":
+            if self.parts > 1:
+                self.log_input()
+            return False
+        if self.parts > MAX_CONTINUATIONS:
+            print(f"⚠️  Reached max continuations ({MAX_CONTINUATIONS}), output may be incomplete")
+            telemetry.current().set(truncated=True)  # fails validation (see validation.py)
+            return False
+        if self.continuation_input >= self.limit:
+            print(f"⚠️  Continuations have used {self.continuation_input:,} uncached input tokens "
+                  f"(limit {self.limit:,}), output may be incomplete")
+            telemetry.current().set(truncated=True)
+            return False
+        print(f"⚠️  Output truncated, continuing... (part {self.parts + 1})")
+        return True
+
+    def log_input(self):
+        total = self.input_tokens + self.cache_write_tokens + self.cache_read_tokens
+        cached = self.cache_read_tokens / total * 100 if total else 0
+        print(f"🧾 {self.parts} parts used {total:,} input tokens ({cached:.0f}% read from cache)")
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Terminal dashboard for a pipeline run — follows the event stream (see events.py) and shows
+what is in flight, how much is queued, rate-limit stalls and a projected completion time.
+
+    python scripts/dashboard.py                      # follow .cache/events.jsonl (or AGENT_EVENTS)
+    python scripts/dashboard.py --once               # print the current state and exit
+    python scripts/dashboard.py --socket /tmp/agent-events.sock   # with AGENT_EVENTS=unix:/tmp/agent-events.sock
+
+It shows the latest run in the stream, or the one given with --run. The projection
+divides the work that is left by the rate at which tasks have finished so far. That work is
+what is queued or in flight, or with --dag every unfinished task in the pipeline. A stage-by-
+stage run only knows the current stage, so its projection ends with that stage.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+
+import events
+
+SLOW_FACTOR = 2       # an in-flight task is flagged when it has run this many times its agent's median
+QUIET_AFTER = 120     # seconds without any event, while tasks are in flight, before the run is flagged
+MAX_ROWS = 20         # in-flight tasks listed
+
+
+def fmt_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+class RunState:
+    """Everything the dashboard knows about one run, built up from its events."""
+
+    def __init__(self, run=None, explicit=False):
+        self.run = run
+        self.explicit = explicit      # seen its run_started, so other runs' events are ignored
+        self.info = {}                # the run_started event
+        self.finished = None          # the last run_finished event, once every process that started has finished
+        self.open = 0                 # run_started minus run_finished (a pool per project root starts several)
+        self.tasks = {}               # (project, task_id) -> state, agent, model, timings and tokens
+        self.first_ts = None
+        self.last_ts = None
+        self.scan = {}
+        self.retries = []             # retrying events
+        self.throttled = []           # throttled events
+        self.totals = {'input_tokens': 0, 'output_tokens': 0, 'cost_usd': 0.0}
+
+    def task(self, event):
+        # Projects of one run can share task ids
+        key = (event.get('project'), event['task_id'])
+        return self.tasks.setdefault(key, {'id': event['task_id'], 'state': 'queued', 'retries': 0,
+                                           'agent': event.get('agent'), 'project': event.get('project')})
+
+    def apply(self, event):
+        self.first_ts = self.first_ts or event['ts']
+        self.last_ts = event['ts']
+        kind = event['event']
+        if kind == 'run_started':
+            self.info = self.info or event
+            self.open += 1
+            self.finished = None
+        elif kind == 'run_finished':
+            self.open -= 1
+            self.finished = event if self.open <= 0 else None
+        elif kind == 'scan':
+            self.scan = event
+        elif kind == 'queued':
+            task = self.task(event)
+            if task['state'] != 'running':
+                task.update(state='queued', queued_at=event['ts'])
+        elif kind == 'started':
+            task = self.task(event)
+            task.update(state='running', started_at=event['ts'], model=event.get('model'),
+                        output_tokens=0, output_chars=None, waiting_until=None)
+        elif kind == 'progress':
+            task = self.task(event)
+            task['output_tokens'] = event.get('output_tokens', task.get('output_tokens', 0))
+            task['output_chars'] = event.get('output_chars')
+        elif kind == 'retrying':
+            self.retries.append(event)
+            task = self.task(event)
+            task['retries'] += 1
+            task['waiting_until'] = event['ts'] + event.get('wait', 0)
+        elif kind == 'throttled':
+            self.throttled.append(event)
+        elif kind in ('completed', 'failed'):
+            task = self.task(event)
+            task.update(state=kind, finished_at=event['ts'], seconds=event.get('seconds'))
+            for key in self.totals:
+                self.totals[key] += event.get(key) or 0
+
+    def counts(self):
+        counts = {'queued': 0, 'running': 0, 'completed': 0, 'failed': 0}
+        for task in self.tasks.values():
+            counts[task['state']] += 1
+        return counts
+
+    def median_seconds(self, agent):
+        seconds = sorted(t['seconds'] for t in self.tasks.values()
+                         if t['state'] == 'completed' and t['agent'] == agent and t.get('seconds'))
+        return seconds[len(seconds) // 2] if seconds else None
+
+    def projection(self, now):
+        """(tasks left, seconds to go) at the completion rate so far; seconds is None until a task has finished."""
+        counts = self.counts()
+        left = counts['queued'] + counts['running']
+        if not self.finished and self.scan.get('remaining') is not None:
+            left = max(left, self.scan['remaining'])
+        done = [t['finished_at'] for t in self.tasks.values() if t['state'] in ('completed', 'failed')]
+        if not done or not left or max(done) <= self.first_ts:
+            return left, None
+        rate = len(done) / (max(done) - self.first_ts)
+        return left, left / rate
+
+    def render(self, now, width=None):
+        counts = self.counts()
+        lines = []
+        mode = ', '.join(f"{key} {self.info[key]}" for key in ('mode', 'engine', 'workers') if key in self.info)
+        elapsed = fmt_duration((self.last_ts if self.finished else now) - self.first_ts) if self.first_ts else '-'
+        lines.append(f"📡 Run {self.run or '-'}" + (f" ({mode})" if mode else '') + f" — {elapsed} elapsed"
+                     + (" — finished" if self.finished else ''))
+        lines.append(f"   Tasks: {counts['completed']} completed, {counts['failed']} failed, "
+                     f"{counts['running']} in flight, {counts['queued']} queued"
+                     + (f" · {self.scan['remaining']} unfinished in the pipeline"
+                        if self.scan.get('remaining') is not None else ''))
+        lines.append(f"   Tokens: {self.totals['input_tokens']:,} in / {self.totals['output_tokens']:,} out"
+                     f" · cost ${self.totals['cost_usd']:.2f}")
+
+        waited = sum(e.get('wait', 0) for e in self.retries)
+        stall = f"   Rate limits: {len(self.retries)} retry(ies), {fmt_duration(waited)} backing off"
+        if self.throttled:
+            stall += (f" · {len(self.throttled)} request(s) held for the shared budget "
+                      f"({fmt_duration(sum(e['seconds'] for e in self.throttled))})")
+        stalled_until = max((e['ts'] + e.get('wait', 0) for e in self.retries), default=0)
+        if stalled_until - now >= 1 and not self.finished:
+            stall += f" · ⏳ stalled for another {fmt_duration(stalled_until - now)}"
+        lines.append(stall)
+
+        if self.finished:
+            lines.append(f"   Finished: {self.finished.get('note') or 'run complete'}")
+        else:
+            left, eta = self.projection(now)
+            if eta is not None:
+                at = datetime.fromtimestamp(now + eta).strftime('%H:%M')
+                lines.append(f"   Projected completion: ~{fmt_duration(eta)} ({left} task(s) left), around {at}")
+            elif left:
+                lines.append(f"   Projected completion: after the first task finishes ({left} task(s) left)")
+            if self.scan.get('gate'):
+                lines.append(f"   ⏸  Waiting at gate {self.scan['gate']}")
+            if counts['running'] and self.last_ts and now - self.last_ts > QUIET_AFTER:
+                lines.append(f"   ⚠️  No events for {fmt_duration(now - self.last_ts)}")
+
+        running = sorted((t for t in self.tasks.values() if t['state'] == 'running'),
+                         key=lambda t: t['started_at'])
+        if running:
+            lines.append('')
+            lines.append(f"   {'TASK':40} {'AGENT':22} {'MODEL':28} {'ELAPSED':>8} {'OUT TOK':>8}  STATUS")
+            for task in running[:MAX_ROWS]:
+                task_id = f"{task['project']}/{task['id']}" if task.get('project') else task['id']
+                status = []
+                if task.get('waiting_until') and task['waiting_until'] > now:
+                    status.append(f"retry in {fmt_duration(task['waiting_until'] - now)}")
+                if task['retries']:
+                    status.append(f"{task['retries']} retry(ies)")
+                if task.get('output_chars'):
+                    status.append(f"streaming {task['output_chars']:,} chars")
+                median = self.median_seconds(task['agent'])
+                if median and now - task['started_at'] > SLOW_FACTOR * median:
+                    status.append(f"slow (median {fmt_duration(median)})")
+                lines.append(f"   {task_id[:40]:40} {(task['agent'] or '-')[:22]:22} {(task.get('model') or '-')[:28]:28} "
+                             f"{fmt_duration(now - task['started_at']):>8} {task.get('output_tokens') or 0:>8,}  "
+                             f"{', '.join(status)}")
+            if len(running) > MAX_ROWS:
+                lines.append(f"   … and {len(running) - MAX_ROWS} more")
+
+        failed = [f"{task['project']}/{task['id']}" if task['project'] else task['id']
+                  for task in self.tasks.values() if task['state'] == 'failed']
+        if failed:
+            lines.append('')
+            lines.append(f"   ❌ Failed: {', '.join(failed[-10:])}")
+        return [line[:width] for line in lines] if width else lines
+
+
+class Dashboard:
+    """Picks the run to show out of the stream and keeps its state."""
+
+    def __init__(self, run=None):
+        self.state = RunState(run, explicit=bool(run))
+        self.pinned = bool(run)
+
+    def feed(self, event):
+        run = event.get('run')
+        state = self.state
+        if run != state.run:
+            # A new run takes over when it starts, or when the current one never announced itself
+            if self.pinned or (state.explicit and event['event'] != 'run_started'):
+                return
+            self.state = state = RunState(run, explicit=event['event'] == 'run_started')
+        elif event['event'] == 'run_started' and state.finished:
+            self.state = state = RunState(run, explicit=True)  # the same run id again, e.g. a rerun in one job
+        state.explicit = state.explicit or event['event'] == 'run_started'
+        state.apply(event)
+
+
+def parse(line):
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) and 'event' in event and 'ts' in event else None
+
+
+def follow_file(path, dashboard, interval, once=False):
+    """Feed every event in the file to the dashboard, then keep reading what is appended."""
+    handle, buffer = None, ''
+    while True:
+        if handle is None and os.path.exists(path):
+            handle = open(path)
+        if handle is not None:
+            if os.path.getsize(path) < handle.tell():
+                handle.seek(0)  # truncated or replaced: start over
+            buffer += handle.read()
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                event = parse(line)
+                if event:
+                    dashboard.feed(event)
+        if once:
+            return
+        draw(dashboard)
+        time.sleep(interval)
+
+
+def follow_socket(path, dashboard, interval):
+    """Listen on a Unix datagram socket (AGENT_EVENTS=unix:PATH) and redraw as events arrive."""
+    if os.path.exists(path):
+        os.unlink(path)  # left over from an earlier dashboard
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    sock.settimeout(interval)
+    try:
+        drawn = 0
+        while True:
+            try:
+                event = parse(sock.recv(65536).decode())
+                if event:
+                    dashboard.feed(event)
+            except socket.timeout:
+                pass
+            if time.monotonic() - drawn >= interval:
+                draw(dashboard)
+                drawn = time.monotonic()
+    finally:
+        sock.close()
+        os.unlink(path)
+
+
+def draw(dashboard):
+    size = os.get_terminal_size(sys.stdout.fileno()) if sys.stdout.isatty() else os.terminal_size((120, 40))
+    lines = dashboard.state.render(time.time(), width=size.columns)
+    sys.stdout.write('\033[H\033[J' + '\n'.join(lines[:size.lines - 1]) + '\n')
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Follow the event stream and show a live view of a pipeline run')
+    parser.add_argument('--file', help='event file to follow (default: AGENT_EVENTS, or .cache/events.jsonl)')
+    parser.add_argument('--socket', metavar='PATH', help='listen for events on this Unix datagram socket instead')
+    parser.add_argument('--run', help='show this run id instead of the latest run')
+    parser.add_argument('--once', action='store_true', help='print the current state of the event file and exit')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between redraws (default: 1)')
+    args = parser.parse_args()
+
+    dashboard = Dashboard(args.run)
+    try:
+        if args.socket:
+            follow_socket(args.socket, dashboard, args.interval)
+        else:
+            path = args.file or events.target()
+            if path == 'off' or path.startswith('unix:'):
+                parser.error(f"AGENT_EVENTS is '{path}': pass --file, or --socket for a socket target")
+            follow_file(path, dashboard, args.interval, once=args.once)
+            if args.once:
+                print('\n'.join(dashboard.state.render(time.time())))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
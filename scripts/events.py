@@ -0,0 +1,111 @@
+"""
+Structured event stream — one JSON object per thing that happens in a run, for scripts/dashboard.py.
+
+  run_started   a scheduler, worker pool or multi-project run begins (mode, workers)
+  scan          the scheduler looked for work (runnable, and remaining with --dag)
+  queued        a task was handed to a worker pool and waits for a slot
+  started       a task began (agent, model)
+  throttled     a request waited for the shared rate budget before it was sent (seconds)
+  retrying      a request failed with a retryable error and waits before the next attempt (outcome, wait)
+  progress      a task produced more output (output_tokens, and output_chars while streaming)
+  completed     a task finished (seconds, tokens, cost_usd, retry_wait_seconds)
+  failed        a task failed (same fields)
+  run_finished  the run stopped (completed, failed, note)
+
+Every event carries ts (epoch seconds), run, pid and, inside a multi-project run, project.
+Task events come from telemetry's TaskRecorder, so every engine and mode emits them.
+
+run is shared by every process of a run: child processes inherit it through AGENT_RUN_ID,
+and in GitHub Actions it is the workflow run id. The dashboard shows the latest run.
+
+Configuration (environment):
+  AGENT_EVENTS             where events go (default: .cache/events.jsonl)
+                             PATH        append JSON lines to a file, which the dashboard follows
+                             unix:PATH   send each event as a datagram to a Unix socket
+                                         (dashboard.py --socket PATH listens there)
+                             off         emit nothing
+  AGENT_PROGRESS_INTERVAL  minimum seconds between two progress events of a task (default: 2)
+
+Emitting never fails a task. An event that can't be written, or that nobody is listening
+for on the socket, is dropped.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+DEFAULT_TARGET = '.cache/events.jsonl'
+DEFAULT_PROGRESS_INTERVAL = 2.0  # seconds
+RUN_ID = os.environ.get('GITHUB_RUN_ID') or os.environ.setdefault('AGENT_RUN_ID', uuid.uuid4().hex[:12])
+
+_lock = threading.Lock()
+_sinks = {}  # target -> open file descriptor or socket
+
+
+def target():
+    return os.environ.get('AGENT_EVENTS', DEFAULT_TARGET)
+
+
+def shared_target():
+    """AGENT_EVENTS for child processes that run in another directory, with its path made absolute."""
+    spec = target()
+    if spec == 'off':
+        return spec
+    if spec.startswith('unix:'):
+        return 'unix:' + str(Path(spec[len('unix:'):]).resolve())
+    return str(Path(spec).resolve())
+
+
+def progress_interval():
+    return float(os.environ.get('AGENT_PROGRESS_INTERVAL', DEFAULT_PROGRESS_INTERVAL))
+
+
+def _open(spec):
+    if spec.startswith('unix:'):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    path = Path(spec)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One write per line with O_APPEND, so lines from parallel processes never interleave
+    return os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+
+def emit(event, **fields):
+    """Send one event. Fields that are None are left out."""
+    spec = target()
+    if spec == 'off':
+        return
+    record = {'ts': round(time.time(), 3), 'event': event, 'run': RUN_ID, 'pid': os.getpid()}
+    if os.environ.get('AGENT_PROJECT'):
+        record['project'] = os.environ['AGENT_PROJECT']
+    record.update((key, value) for key, value in fields.items() if value is not None)
+    line = (json.dumps(record) + '\n').encode()
+
+    with _lock:
+        try:
+            sink = _sinks.get(spec)
+            if sink is None:
+                sink = _sinks[spec] = _open(spec)
+            if spec.startswith('unix:'):
+                sink.sendto(line, spec[len('unix:'):])
+            else:
+                os.write(sink, line)
+        except OSError:
+            pass  # no listener, or nowhere to write: the run goes on without its events
+
+
+class Throttle:
+    """Lets an event through at most once per interval, e.g. one task's progress."""
+
+    def __init__(self, interval=None):
+        self.interval = progress_interval() if interval is None else interval
+        self.last = None
+
+    def ready(self):
+        now = time.monotonic()
+        if self.last is not None and now - self.last < self.interval:
+            return False
+        self.last = now
+        return True
@@ -2,13 +2,131 @@
 """
 Generic pipeline interpreter — reads pipeline.yml and returns all currently runnable tasks.
 Parallel-safe: uses sentinel files for completion tracking.
+With several --root options it lists the runnable tasks of every project (see projects.py).
+
+Startup is kept short, since CI runs this on every push under docs/. The pipeline is compiled
+once into .cache/pipeline.json (routing resolved, see models.py), so yaml is only imported
+when pipeline.yml or models.py has changed.
 """
+import hashlib
 import json
+import os
 import re
 import sys
+import time
 from pathlib import Path
 
-import yaml
+import fingerprints
+import models
+
+INDEX_PATH = Path('docs/.state/index.json')
+COMPILED_PATH = Path('.cache/pipeline.json')  # relative to the directory of pipeline.yml
+RACY_NS = 1_000_000_000  # mtimes this close to the time they were recorded aren't trusted
+
+
+# ---------------------------------------------------------------------------
+# State index — persistent per-file fingerprints so unchanged docs are never re-read
+# ---------------------------------------------------------------------------
+
+class StateIndex:
+    """File-level cache of content hashes, ready-signal lookups and task statuses.
+
+    An entry is trusted while the file's mtime and size are unchanged; otherwise the file is
+    re-read once and, if its hash still matches, its cached signal results are kept.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = Path(path)
+        self.files = {}
+        self.tasks = {}
+        self.dirty = False
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                self.files = data.get('files', {})
+                self.tasks = data.get('tasks', {})
+            except (ValueError, OSError):
+                self.dirty = True  # corrupt index — rebuild from scratch
+
+    def _entry(self, path):
+        """Return (entry, content) — content is only set if the file had to be read."""
+        stat = path.stat()
+        entry = self.files.get(str(path))
+        if (entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size
+                and entry['mtime_ns'] < entry['checked_ns'] - RACY_NS):
+            return entry, None
+
+        content = path.read_text()
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        if not entry or entry['sha256'] != digest:
+            entry = {'sha256': digest, 'signals': {}}
+        entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size, checked_ns=time.time_ns())
+        self.files[str(path)] = entry
+        self.dirty = True
+        return entry, content
+
+    def contains(self, path, signal):
+        """Whether the file contains signal, reading it only if it changed since last checked."""
+        path = Path(path)
+        entry, content = self._entry(path)
+        if signal not in entry['signals']:
+            if content is None:
+                content = path.read_text()
+            entry['signals'][signal] = signal in content
+            self.dirty = True
+        return entry['signals'][signal]
+
+    def digest(self, path):
+        """Content hash of a file (None if missing), reading it only if it changed since last checked."""
+        path = Path(path)
+        if not path.is_file():
+            return None
+        return self._entry(path)[0]['sha256']
+
+    def record_task(self, task_id, status):
+        if self.tasks.get(task_id) != status:
+            self.tasks[task_id] = status
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'files': self.files, 'tasks': self.tasks}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+_index = None
+_glob_cache = {}    # (directory, pattern) -> (directory mtime_ns, sorted paths)
+_pass_results = {}  # stage id -> result (and the refinement ready_signal), reset on every collect_tasks pass
+
+
+def get_index():
+    global _index
+    if _index is None:
+        _index = StateIndex()
+    return _index
+
+
+def list_dir(directory, pattern):
+    """Sorted glob of a directory, memoized on the directory's mtime."""
+    directory = Path(directory)
+    try:
+        mtime = directory.stat().st_mtime_ns
+    except FileNotFoundError:
+        return []
+    key = (str(directory), pattern)
+    cached = _glob_cache.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    result = sorted(directory.glob(pattern))
+    if mtime < time.time_ns() - RACY_NS:
+        _glob_cache[key] = (mtime, result)
+    return result
 
 
 # ---------------------------------------------------------------------------
@@ -19,29 +137,65 @@ def is_complete(task_id):
     return Path(f'docs/.state/completed/{task_id}.done').exists()
 
 
+def stale_inputs(task_id, agent, task_input, paths_only=(), model=models.MODEL):
+    """Inputs that changed since the task's output was generated (see fingerprints)."""
+    reasons = fingerprints.stale_reasons(task_id, agent, task_input, model, digest=get_index().digest,
+                                         paths_only=paths_only)
+    if reasons:
+        print(f"# {task_id} is stale: {', '.join(reasons)} changed", file=sys.stderr)
+    return reasons
+
+
+def task_done(task_id, output, agent=None, task_input=None, paths_only=(), model=models.MODEL):
+    """A task is done once its sentinel or its output exists — unless, when agent and task_input
+    are given, its inputs (or its model) changed since it ran. Records the status in the index."""
+    done = is_complete(task_id) or Path(output).exists()
+    status = 'complete' if done else 'pending'
+    if done and agent and stale_inputs(task_id, agent, task_input, paths_only, model):
+        done, status = False, 'stale'
+    get_index().record_task(task_id, status)
+    return done
+
+
 def get_all_spec_files():
     """Return all engineering spec files, excluding the review doc itself."""
-    specs_dir = Path('docs/05-specs')
-    if not specs_dir.exists():
-        return []
-    return sorted(
-        str(p) for p in specs_dir.glob('*.md')
+    return [
+        str(p) for p in list_dir('docs/05-specs', '*.md')
         if not p.name.startswith('spec-review')
         and not p.name.startswith('SPEC-REVIEW')
-    )
+    ]
+
+
+def iteration_of(path):
+    """Iteration number of a refinement file (questions-iter-3.md, updated-v1.3.md -> 3)."""
+    return int(re.search(r'(\d+)\.md$', Path(path).name).group(1))
+
+
+def refinement_files(stem, pattern, reviewed=False):
+    """A feature's refinement files matching pattern, in iteration order, from its current loop only.
+
+    Once the tech lead signals ready at iteration k, the loop stops: questions-iter-k is its last review
+    and updated-v1.(k-1) its last document. Files past that (reviewed=True: the questions file, which
+    keeps iteration k) are left over from a run before the feature was edited and converged sooner.
+    """
+    files = sorted(list_dir(f'docs/03-refinement/{stem}', pattern), key=iteration_of)
+    if 'ready_signal' not in _pass_results:
+        stage = next((s for s in load_pipeline() or [] if s['type'] == 'refinement-loop'), {})
+        _pass_results['ready_signal'] = stage.get('ready_signal', 'READY FOR IMPLEMENTATION')
+    for questions_file in sorted(list_dir(f'docs/03-refinement/{stem}', 'questions-iter-*.md'), key=iteration_of):
+        if get_index().contains(questions_file, _pass_results['ready_signal']):
+            last = iteration_of(questions_file) - (0 if reviewed else 1)
+            return [f for f in files if iteration_of(f) <= last]
+    return files
 
 
 def get_latest_feature_docs():
-    features_dir = Path('docs/02-features')
-    refinement_dir = Path('docs/03-refinement')
     docs = []
-    for feature_file in sorted(features_dir.glob('*.md')):
-        refined_dir = refinement_dir / feature_file.stem
-        if refined_dir.exists():
-            updates = sorted(refined_dir.glob('updated-v1.*.md'))
-            if updates:
-                docs.append(str(updates[-1]))
-                continue
+    for feature_file in list_dir('docs/02-features', '*.md'):
+        updates = refinement_files(feature_file.stem, 'updated-v1.*.md')
+        if updates:
+            docs.append(str(updates[-1]))
+            continue
         docs.append(str(feature_file))
     return docs
 
@@ -49,22 +203,18 @@ def get_latest_feature_docs():
 def get_latest_feature_doc(feature_id, feature_slug):
     """Return the most refined version of a single feature doc, falling back to the initial breakdown."""
     stem = f'{feature_id}-{feature_slug}'
-    refined_dir = Path(f'docs/03-refinement/{stem}')
-    if refined_dir.exists():
-        updates = sorted(refined_dir.glob('updated-v1.*.md'))
-        if updates:
-            return str(updates[-1])
+    updates = refinement_files(stem, 'updated-v1.*.md')
+    if updates:
+        return str(updates[-1])
     return f'docs/02-features/{stem}.md'
 
 
 def get_latest_questions_file(feature_id, feature_slug):
     """Return the highest-iteration tech-lead questions file for a feature, or None if none exist."""
     stem = f'{feature_id}-{feature_slug}'
-    refined_dir = Path(f'docs/03-refinement/{stem}')
-    if refined_dir.exists():
-        questions = sorted(refined_dir.glob('questions-iter-*.md'))
-        if questions:
-            return str(questions[-1])
+    questions = refinement_files(stem, 'questions-iter-*.md', reviewed=True)
+    if questions:
+        return str(questions[-1])
     return None
 
 
@@ -128,8 +278,12 @@ def parse_feature_registry():
     return registry
 
 
-def build_task(task_id, agent, output_path, task_input):
-    return {'id': task_id, 'agent': agent, 'output_path': output_path, 'input': task_input}
+def build_task(task_id, agent, output_path, task_input, sections=None, route=None):
+    task = {'id': task_id, 'agent': agent, 'output_path': output_path, 'input': task_input,
+            **(route or models.of({}))}
+    if sections:
+        task['sections'] = sections
+    return task
 
 
 # ---------------------------------------------------------------------------
@@ -139,10 +293,11 @@ def build_task(task_id, agent, output_path, task_input):
 def process_single(stage):
     task_id = stage.get('task_id', stage['id'])
     output = stage['output']
-    if is_complete(task_id) or Path(output).exists():
-        return []
     task_input = resolve_input(stage.get('input', {}))
-    return [build_task(task_id, stage['agent'], output, task_input)]
+    route = models.of(stage)
+    if task_done(task_id, output, stage['agent'], task_input, stage.get('track_paths_only', ()), route['model']):
+        return []
+    return [build_task(task_id, stage['agent'], output, task_input, stage.get('sections'), route)]
 
 
 def process_gate(stage):
@@ -156,17 +311,18 @@ def process_per_feature(stage):
     registry = parse_feature_registry()
     if not registry:
         return []
+    route = models.of(stage)
     tasks = []
     for feature_id, feature in registry.items():
         kwargs = {'feature_id': feature_id, 'feature_slug': feature['slug'], 'feature_name': feature['name']}
         task_id = stage['task_id'].format(**kwargs)
         output = stage['output'].format(**kwargs)
-        if is_complete(task_id) or Path(output).exists():
-            continue
         task_input = resolve_input(stage.get('input', {}), **kwargs)
         task_input['feature_id'] = feature_id
         task_input['feature'] = feature['slug']
-        tasks.append(build_task(task_id, stage['agent'], output, task_input))
+        if task_done(task_id, output, stage['agent'], task_input, stage.get('track_paths_only', ()), route['model']):
+            continue
+        tasks.append(build_task(task_id, stage['agent'], output, task_input, stage.get('sections'), route))
     return tasks
 
 
@@ -175,20 +331,18 @@ def process_parallel_group(stage):
     for subtask in stage['tasks']:
         task_id = subtask['task_id']
         output = subtask['output']
-        if is_complete(task_id) or Path(output).exists():
-            continue
         task_input = resolve_input(subtask.get('input', {}))
-        tasks.append(build_task(task_id, subtask['agent'], output, task_input))
+        route = models.of(subtask)
+        if task_done(task_id, output, subtask['agent'], task_input, subtask.get('track_paths_only', ()),
+                     route['model']):
+            continue
+        tasks.append(build_task(task_id, subtask['agent'], output, task_input, subtask.get('sections'), route))
     return tasks
 
 
 def process_refinement_loop(stage):
     """Tech-lead / product-spec iteration loop, one chain per feature, all features in parallel."""
-    features_dir = Path('docs/02-features')
-    if not features_dir.exists():
-        return []
-
-    feature_files = list(features_dir.glob('*.md'))
+    feature_files = list_dir('docs/02-features', '*.md')
     if not feature_files:
         return []
 
@@ -203,10 +357,11 @@ def process_refinement_loop(stage):
     ready_signal = stage.get('ready_signal', 'READY FOR IMPLEMENTATION')
     reviewer = stage['reviewer']
     responder = stage['responder']
+    reviewer_route, responder_route = models.of(reviewer), models.of(responder)
     refinement_dir = Path('docs/03-refinement')
     tasks = []
 
-    for feature_file in sorted(feature_files):
+    for feature_file in feature_files:
         stem = feature_file.stem
         match = re.match(r'(FEAT-\d+)-(.+)', stem)
         if not match:
@@ -223,34 +378,50 @@ def process_refinement_loop(stage):
             updated_file = Path(refine_output)
 
             # Tech-lead step
+            prev_updated = Path(responder['output'].format(
+                feature_id=feature_id, feature_slug=feature_slug, iteration=iteration - 1
+            ))
+            input_doc = str(prev_updated) if iteration > 1 else str(feature_file)
+            questions_input = {'feature_id': feature_id, 'feature': feature_slug,
+                               'iteration': iteration, 'feature_doc': input_doc}
             if not questions_file.exists():
-                prev_updated = Path(responder['output'].format(
-                    feature_id=feature_id, feature_slug=feature_slug, iteration=iteration - 1
-                ))
                 prereq_met = (iteration == 1) or prev_updated.exists()
                 if prereq_met and not is_complete(questions_task_id):
-                    input_doc = str(prev_updated) if iteration > 1 else str(feature_file)
-                    task_input = {'feature_id': feature_id, 'feature': feature_slug,
-                                  'iteration': iteration, 'feature_doc': input_doc}
-                    tasks.append(build_task(questions_task_id, reviewer['agent'], questions_output, task_input))
+                    tasks.append(build_task(questions_task_id, reviewer['agent'], questions_output, questions_input,
+                                            route=reviewer_route))
+                break
+            if stale_inputs(questions_task_id, reviewer['agent'], questions_input, model=reviewer_route['model']):
+                tasks.append(build_task(questions_task_id, reviewer['agent'], questions_output, questions_input,
+                                        route=reviewer_route))
                 break
 
-            with open(questions_file) as f:
-                if ready_signal in f.read():
-                    break
+            if get_index().contains(questions_file, ready_signal):
+                break
 
             # Product-spec step
+            refine_input = {'feature_id': feature_id, 'feature': feature_slug,
+                            'iteration': iteration, 'feature_doc': str(feature_file),
+                            'questions_file': str(questions_file)}
             if not updated_file.exists():
                 if not is_complete(refine_task_id):
-                    task_input = {'feature_id': feature_id, 'feature': feature_slug,
-                                  'iteration': iteration, 'feature_doc': str(feature_file),
-                                  'questions_file': str(questions_file)}
-                    tasks.append(build_task(refine_task_id, responder['agent'], refine_output, task_input))
+                    tasks.append(build_task(refine_task_id, responder['agent'], refine_output, refine_input,
+                                            route=responder_route))
+                break
+            if stale_inputs(refine_task_id, responder['agent'], refine_input, model=responder_route['model']):
+                tasks.append(build_task(refine_task_id, responder['agent'], refine_output, refine_input,
+                                        route=responder_route))
                 break
 
     return tasks
 
 
+def refinement_result(stage):
+    """process_refinement_loop, computed at most once per collect_tasks pass."""
+    if stage['id'] not in _pass_results:
+        _pass_results[stage['id']] = process_refinement_loop(stage)
+    return _pass_results[stage['id']]
+
+
 def process_specs_gate(stage, pipeline):
     """Gate that only activates once all features are READY FOR IMPLEMENTATION."""
     if Path(stage['sentinel']).exists():
@@ -262,14 +433,10 @@ def process_specs_gate(stage, pipeline):
 
     # If refinement loop still has work, don't gate yet
     refinement_stage = next((s for s in pipeline if s['type'] == 'refinement-loop'), None)
-    if refinement_stage and process_refinement_loop(refinement_stage):
-        return []
-
-    features_dir = Path('docs/02-features')
-    if not features_dir.exists():
+    if refinement_stage and refinement_result(refinement_stage):
         return []
 
-    expected = {f.stem for f in features_dir.glob('*.md')}
+    expected = {f.stem for f in list_dir('docs/02-features', '*.md')}
     if not expected:
         return []
 
@@ -278,11 +445,10 @@ def process_specs_gate(stage, pipeline):
     for feature_dir in refinement_dir.iterdir():
         if not feature_dir.is_dir():
             continue
-        for qf in sorted(feature_dir.glob('questions-*.md'), reverse=True):
-            with open(qf) as f:
-                if ready_signal in f.read():
-                    ready.add(feature_dir.name)
-                    break
+        for qf in reversed(list_dir(feature_dir, 'questions-*.md')):
+            if get_index().contains(qf, ready_signal):
+                ready.add(feature_dir.name)
+                break
 
     if ready >= expected:
         print(f"⏸  Gate: {stage['message']}", file=sys.stderr)
@@ -295,49 +461,173 @@ def process_specs_gate(stage, pipeline):
 # Main
 # ---------------------------------------------------------------------------
 
-def find_next_tasks():
-    pipeline_path = Path('pipeline.yml')
-    if not pipeline_path.exists():
+def load_pipeline(pipeline_path='pipeline.yml'):
+    """Load the stage list from pipeline.yml, or None if it doesn't exist.
+    Every task definition comes back with its model and max_tokens resolved (see models.py).
+
+    The result is compiled to .cache/pipeline.json. Like a StateIndex entry, it is trusted
+    while pipeline.yml's mtime and size are unchanged; otherwise the file is re-read once and
+    kept if its hash still matches. A change to models.py recompiles it too.
+    """
+    pipeline_path = Path(pipeline_path)
+    try:
+        st = pipeline_path.stat()
+    except FileNotFoundError:
+        return None
+    compiled_path = pipeline_path.parent / COMPILED_PATH
+    compiled = {}
+    if compiled_path.exists():
+        try:
+            with open(compiled_path) as f:
+                compiled = json.load(f)
+        except (OSError, ValueError):
+            compiled = {}
+
+    routing = fingerprints.file_digest(Path(models.__file__))
+    stat = [st.st_mtime_ns, st.st_size]
+    if compiled.get('routing') == routing and compiled.get('stat') == stat:
+        return compiled['pipeline']
+
+    text = pipeline_path.read_text()
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    if compiled.get('routing') == routing and compiled.get('digest') == digest:
+        pipeline = compiled['pipeline']
+    else:
+        import yaml
+        config = yaml.safe_load(text)
+        pipeline = models.route(config['pipeline'], config.get('models'))
+
+    racy = st.st_mtime_ns >= time.time_ns() - RACY_NS
+    compiled = {'routing': routing, 'digest': digest, 'stat': None if racy else stat, 'pipeline': pipeline}
+    try:
+        compiled_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = compiled_path.with_name(compiled_path.name + f'.{os.getpid()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(compiled, f)
+        os.replace(tmp, compiled_path)
+    except OSError:
+        pass  # read-only checkout: compile again next time
+    return pipeline
+
+
+def process_stage(stage, pipeline):
+    """Dispatch a stage to its processor — returns [] (pass), [tasks] (work to do), or None (gate)."""
+    stage_type = stage['type']
+    if stage_type == 'gate':
+        return process_specs_gate(stage, pipeline) if stage['id'] == 'specs-approval' else process_gate(stage)
+    if stage_type == 'single':
+        return process_single(stage)
+    if stage_type == 'per-feature':
+        return process_per_feature(stage)
+    if stage_type == 'parallel-group':
+        return process_parallel_group(stage)
+    if stage_type == 'refinement-loop':
+        return refinement_result(stage)
+    print(f"# Unknown stage type: {stage_type}", file=sys.stderr)
+    return []
+
+
+def collect_tasks(pipeline):
+    """Walk the pipeline and stop at the first stage that has work or is gated.
+
+    Returns (stage, tasks) for that stage, (stage, None) for a closed gate,
+    or (None, []) once every stage is complete.
+    """
+    _pass_results.clear()
+    try:
+        for stage in pipeline:
+            result = process_stage(stage, pipeline)
+            if result is None or result:
+                return stage, result
+        return None, []
+    finally:
+        get_index().save()
+
+
+def find_dag_tasks(pipeline, explain=False):
+    """Release every runnable task across all stages, ordered by critical-path length."""
+    from pipeline_dag import runnable_tasks
+
+    dag, runnable = runnable_tasks(pipeline)
+    if explain:
+        for line in dag.explain():
+            print(f"# {line}", file=sys.stderr)
+
+    if runnable:
+        tasks = [task for _, task in runnable]
+        print("has_tasks=true")
+        print(f"tasks={json.dumps(tasks)}")
+        print(f"# DAG: {len(tasks)} runnable task(s): {[t['id'] for t in tasks]}", file=sys.stderr)
+        return
+
+    print("has_tasks=false")
+    gates = dag.pending_gates()
+    if gates:
+        print(f"gate={gates[0].id}")
+    for gate in gates:
+        print(f"⏸  Gate: {gate.reason}", file=sys.stderr)
+    if all(node.done for node in dag.nodes.values()):
+        print("# All stages complete", file=sys.stderr)
+
+
+def find_next_tasks(use_dag=False, explain=False):
+    pipeline = load_pipeline()
+    if pipeline is None:
         print("has_tasks=false")
         print("# pipeline.yml not found", file=sys.stderr)
         return
 
-    with open(pipeline_path) as f:
-        config = yaml.safe_load(f)
-
-    pipeline = config['pipeline']
-
-    for stage in pipeline:
-        stage_type = stage['type']
-        stage_id = stage['id']
-
-        if stage_type == 'gate':
-            result = process_specs_gate(stage, pipeline) if stage_id == 'specs-approval' else process_gate(stage)
-        elif stage_type == 'single':
-            result = process_single(stage)
-        elif stage_type == 'per-feature':
-            result = process_per_feature(stage)
-        elif stage_type == 'parallel-group':
-            result = process_parallel_group(stage)
-        elif stage_type == 'refinement-loop':
-            result = process_refinement_loop(stage)
-        else:
-            print(f"# Unknown stage type: {stage_type}", file=sys.stderr)
-            result = []
-
-        if result is None:
-            print("has_tasks=false")
-            return
+    if use_dag or explain:
+        find_dag_tasks(pipeline, explain=explain)
+        return
 
-        if result:
-            print("has_tasks=true")
-            print(f"tasks={json.dumps(result)}")
-            print(f"# Stage: {stage_id} — {len(result)} task(s): {[t['id'] for t in result]}", file=sys.stderr)
-            return
+    stage, result = collect_tasks(pipeline)
+
+    if result is None:
+        print("has_tasks=false")
+        print(f"gate={stage['id']}")
+        return
+
+    if result:
+        print("has_tasks=true")
+        print(f"tasks={json.dumps(result)}")
+        print(f"# Stage: {stage['id']} — {len(result)} task(s): {[t['id'] for t in result]}", file=sys.stderr)
+        return
 
     print("has_tasks=false")
     print("# All stages complete", file=sys.stderr)
 
 
+def find_project_tasks(roots, use_dag=False):
+    """Runnable tasks of several projects as one list, each task tagged with its project root."""
+    from projects import Project, interleave, scan
+
+    projects = [Project.parse(root) for root in roots]
+    for project in projects:
+        scan(project, use_dag)
+        print(f"# {project.name}: {len(project.queue)} runnable task(s)"
+              + (f" — {project.note}" if project.note else ""), file=sys.stderr)
+    tasks = interleave(projects)
+    print(f"has_tasks={'true' if tasks else 'false'}")
+    if tasks:
+        print(f"tasks={json.dumps(tasks)}")
+
+
 if __name__ == '__main__':
-    find_next_tasks()
+    import argparse
+    parser = argparse.ArgumentParser(description='Print the currently runnable pipeline tasks')
+    parser.add_argument('--dag', action='store_true',
+                        help='release runnable tasks from every stage at once, ordered by critical path')
+    parser.add_argument('--explain', action='store_true',
+                        help='(implies --dag) explain on stderr why each unfinished task is blocked')
+    parser.add_argument('--root', action='append', metavar='PATH[:WEIGHT]',
+                        help='project root (default: current directory); repeat to list the tasks of several '
+                             'projects, interleaved by weight and tagged with their root')
+    args = parser.parse_args()
+    if args.root and len(args.root) > 1:
+        find_project_tasks(args.root, use_dag=args.dag)
+    else:
+        if args.root:
+            from projects import Project
+            os.chdir(Project.parse(args.root[0]).root)
+        find_next_tasks(use_dag=args.dag, explain=args.explain)
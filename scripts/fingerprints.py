@@ -0,0 +1,91 @@
+"""
+Input fingerprints — what each completed task was generated from.
+
+When a task passes, run-task writes docs/.state/fingerprints/{task_id}.json: the model, the task
+input, and a hash of every file the prompt was built from (resolved input files, the agent prompt
+and the tech stack standards). find-next-task compares it with the current state. If anything
+changed, the task is stale and runs again, and so in turn do the tasks whose inputs that re-run
+changes. Tasks completed before fingerprints existed have none and are treated as fresh.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from models import MODEL
+
+FINGERPRINT_DIR = Path('docs/.state/fingerprints')
+PROMPT_FILES = ('agents/{agent}/prompt.md', 'context/tech-stack-standards.md')
+
+
+def file_digest(path):
+    """sha256 of a file's text (same scheme as the state index), or None if it doesn't exist."""
+    path = Path(path)
+    if not path.is_file():
+        return None
+    return hashlib.sha256(path.read_text().encode()).hexdigest()
+
+
+def input_paths(agent, task_input, paths_only=()):
+    """Files a task's prompt is built from. Inputs listed in paths_only are left out — for those
+    only the list of paths matters (it is part of the task input), not the files' contents."""
+    paths = [template.format(agent=agent) for template in PROMPT_FILES]
+    for key, value in task_input.items():
+        if key in paths_only:
+            continue
+        values = value if isinstance(value, list) else [value]
+        paths += [v for v in values if isinstance(v, str) and v.startswith(('docs/', 'context/'))]
+    return sorted(set(paths))
+
+
+def compute(agent, task_input, model=MODEL, digest=file_digest):
+    return {
+        'agent': agent,
+        'model': model,
+        'input': task_input,
+        'files': {path: digest(path) for path in input_paths(agent, task_input)},
+    }
+
+
+def save(task_id, fingerprint):
+    FINGERPRINT_DIR.mkdir(parents=True, exist_ok=True)
+    path = FINGERPRINT_DIR / f'{task_id}.json'
+    tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(fingerprint, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def load(task_id):
+    path = FINGERPRINT_DIR / f'{task_id}.json'
+    if not path.exists():
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def stale_reasons(task_id, agent, task_input, model=MODEL, digest=file_digest, paths_only=()):
+    """What changed since the task last ran ([] if nothing did, or it has no fingerprint)."""
+    recorded = load(task_id)
+    if recorded is None:
+        return []
+    return compare(recorded, agent, task_input, model, digest, paths_only)
+
+
+def compare(recorded, agent, task_input, model=MODEL, digest=file_digest, paths_only=()):
+    """What differs between a recorded fingerprint and the given task and current files."""
+    reasons = []
+    if recorded.get('agent') != agent:
+        reasons.append('agent')
+    if recorded.get('model') != model:
+        reasons.append(f"model {recorded.get('model')} → {model}")
+    if json.dumps(recorded.get('input'), sort_keys=True) != json.dumps(task_input, sort_keys=True):
+        reasons.append('task input')
+    files = recorded.get('files', {})
+    for path in input_paths(agent, task_input, paths_only):
+        if path in files and digest(path) != files[path]:
+            reasons.append(path)
+    return reasons
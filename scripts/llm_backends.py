@@ -0,0 +1,521 @@
+"""
+Pluggable LLM backends behind the Anthropic client interface used by run-task and the async engine.
+
+Every backend exposes client.messages.create(...), client.messages.stream(...) and
+client.messages.batches (plus an async client with messages.create), so the call sites, retry logic
+and rate coordinator are exercised unchanged whichever one is selected:
+
+  anthropic   the real API (default)
+  record      the real API, with every request/response pair also saved to AGENT_RECORD_DIR
+  replay      answers from AGENT_RECORD_DIR only — no network; a request never recorded is an error
+  mock        synthetic answers — simulated latency, prompt caching, max_tokens truncation, 429/529 errors
+              and server/connection errors;
+              like the API, it rejects a request with more than 4 cache breakpoints (400)
+
+Configuration (environment):
+  AGENT_BACKEND              anthropic | record | replay | mock (default: anthropic)
+  AGENT_RECORD_DIR           recordings location (default: .cache/recordings)
+  AGENT_MOCK_LATENCY         seconds before the first token (default: 0.05)
+  AGENT_MOCK_TPS             output tokens per second; 0 = instant (default: 0)
+  AGENT_MOCK_OUTPUT_TOKENS   approximate length of each generated document (default: 400)
+  AGENT_MOCK_TRUNCATE_AT     cap output tokens per response below max_tokens, to force continuations
+  AGENT_MOCK_ERROR_RATE      probability (0-1) that an attempt fails with a 429 or 529 (default: 0)
+  AGENT_MOCK_SERVER_ERROR_RATE  probability (0-1) that an attempt fails with a 500, 503, dropped connection
+                             or timeout (default: 0)
+  AGENT_MOCK_RETRY_AFTER     retry-after sent with simulated errors, in seconds (default: 0.05)
+  AGENT_MOCK_SEED            seed for simulated errors (default: 0)
+  AGENT_MOCK_FEATURES        features listed in the mock PRD (default: 3)
+  AGENT_MOCK_READY_AFTER     tech-lead iteration that signals READY FOR IMPLEMENTATION (default: 2)
+  AGENT_MOCK_INVALID_RATE    probability (0-1) that a document leaves out its required headings (default: 0)
+
+Mock behaviour is a pure function of the request and the attempt number, so a run is reproducible
+however the scheduler interleaves tasks.
+
+The SDK takes about a second to import, so it is only imported once a client or an SDK error
+is needed. Offline backends never load it unless they simulate an error.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import validation
+
+BACKENDS = ('anthropic', 'record', 'replay', 'mock')
+OFFLINE_BACKENDS = ('replay', 'mock')
+CHARS_PER_TOKEN = 4
+STREAM_CHUNK = 200  # characters per simulated stream delta
+MAX_CACHE_BREAKPOINTS = 4  # blocks with cache_control per request; the API rejects more
+BATCH_ATTEMPTS = 10  # attempts per request of a local batch before its result is errored
+LOCAL_BATCH_DIR = Path('.cache/batches')  # requests of batches submitted to an offline backend
+TASK_INPUT_RE = re.compile(r'## Task Input\n\n```json\n(.*?)\n```', re.DOTALL)
+SECTION_RE = re.compile(r'^Write [^`\n]*`## ([^`]+)`', re.MULTILINE)  # see sections.instruction
+
+
+def backend_name():
+    name = os.environ.get('AGENT_BACKEND', 'anthropic').lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown AGENT_BACKEND '{name}' (expected one of: {', '.join(BACKENDS)})")
+    return name
+
+
+def is_offline():
+    return backend_name() in OFFLINE_BACKENDS
+
+
+def request_key(params):
+    """Stable hash of everything that determines a response."""
+    relevant = {k: params.get(k) for k in ('model', 'max_tokens', 'system', 'messages')}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
+
+def request_blocks(params):
+    """Every content block in a request, system blocks first (plain-string turns become one block)."""
+    blocks = list(params.get('system') or [])
+    for message in params['messages']:
+        content = message['content']
+        blocks += [{'type': 'text', 'text': content}] if isinstance(content, str) else content
+    return blocks
+
+
+def request_text(params):
+    """All prompt text in a request (system blocks and every message), for token estimates."""
+    return "\n\n".join(block['text'] for block in request_blocks(params))
+
+
+def make_response(text, stop_reason, input_tokens, output_tokens, cache_write=0, cache_read=0, model=None):
+    """Response object with the attributes run-task reads from an anthropic Message."""
+    usage = SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens,
+                            cache_creation_input_tokens=cache_write, cache_read_input_tokens=cache_read)
+    return SimpleNamespace(content=[SimpleNamespace(type='text', text=text)], stop_reason=stop_reason,
+                           usage=usage, model=model)
+
+
+def response_dict(response):
+    usage = response.usage
+    return {
+        'text': response.content[0].text,
+        'stop_reason': response.stop_reason,
+        'usage': {
+            'input_tokens': usage.input_tokens,
+            'output_tokens': usage.output_tokens,
+            'cache_write': getattr(usage, 'cache_creation_input_tokens', None) or 0,
+            'cache_read': getattr(usage, 'cache_read_input_tokens', None) or 0,
+        },
+    }
+
+
+def simulated_error(status_code, retry_after=0, message=None):
+    """A real SDK error object, so retry handling takes exactly the path it would in production.
+    status_code 'connection' or 'timeout' gives the error the SDK raises when no response arrives."""
+    from anthropic import APIConnectionError, APIStatusError, APITimeoutError, BadRequestError, RateLimitError
+    if status_code == 'connection':
+        return APIConnectionError(message='Simulated dropped connection (mock backend)', request=None)
+    if status_code == 'timeout':
+        return APITimeoutError(request=None)
+    response = SimpleNamespace(status_code=status_code, request=None,
+                               headers={'retry-after-ms': str(int(retry_after * 1000))})
+    if status_code == 400:
+        return BadRequestError(message or 'Simulated invalid request (mock backend)', response=response, body=None)
+    if status_code == 429:
+        return RateLimitError('Simulated rate limit (mock backend)', response=response, body=None)
+    if status_code == 529:
+        return APIStatusError('Simulated overload (mock backend)', response=response, body=None)
+    return APIStatusError('Simulated server error (mock backend)', response=response, body=None)
+
+
+# ---------------------------------------------------------------------------
+# Offline backends: respond(params) -> (response, latency in seconds)
+# ---------------------------------------------------------------------------
+
+class MockBackend:
+    def __init__(self, latency=0.05, tps=0, output_tokens=400, truncate_at=None, error_rate=0.0,
+                 server_error_rate=0.0, retry_after=0.05, seed=0, features=3, ready_after=2, invalid_rate=0.0, agents_dir='agents'):
+        self.latency = latency
+        self.tps = tps
+        self.output_tokens = output_tokens
+        self.truncate_at = truncate_at
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.features = features
+        self.ready_after = ready_after
+        self.invalid_rate = invalid_rate
+        self.agents_dir = Path(agents_dir)
+        self._agents = None
+        self._attempts = {}
+        self._cached = set()  # prefixes written to the simulated prompt cache
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        truncate_at = env('AGENT_MOCK_TRUNCATE_AT')
+        return cls(latency=float(env('AGENT_MOCK_LATENCY', 0.05)), tps=float(env('AGENT_MOCK_TPS', 0)),
+                   output_tokens=int(env('AGENT_MOCK_OUTPUT_TOKENS', 400)),
+                   truncate_at=int(truncate_at) if truncate_at else None,
+                   error_rate=float(env('AGENT_MOCK_ERROR_RATE', 0)),
+                   server_error_rate=float(env('AGENT_MOCK_SERVER_ERROR_RATE', 0)),
+                   retry_after=float(env('AGENT_MOCK_RETRY_AFTER', 0.05)), seed=env('AGENT_MOCK_SEED', '0'),
+                   features=int(env('AGENT_MOCK_FEATURES', 3)), ready_after=int(env('AGENT_MOCK_READY_AFTER', 2)),
+                   invalid_rate=float(env('AGENT_MOCK_INVALID_RATE', 0)))
+
+    def identify_agent(self, params):
+        """Agent whose prompt.md is the request's last system block (or 'agent' if unknown)."""
+        if self._agents is None:
+            self._agents = {p.read_text(): p.parent.name for p in self.agents_dir.glob('*/prompt.md')}
+        system = params.get('system') or []
+        return self._agents.get(system[-1]['text'], 'agent') if system else 'agent'
+
+    def document(self, agent, task_input, source='', requested=()):
+        """The full text this agent 'writes' for a task — deterministic, with numbered lines.
+        source identifies the prompt it was written from, so edited inputs give different output.
+        The document carries the headings and markers validation.py requires (requested: the section
+        headings the request asked for), unless AGENT_MOCK_INVALID_RATE leaves them out."""
+        if agent.startswith('judge-'):
+            return json.dumps({'result': 'PASS', 'score': 90, 'issues': []}) + "\n"
+        title = agent.replace('-', ' ').title()
+        heading = f"# {title}: {task_input.get('feature_id') or task_input.get('type') or 'Output'}"
+        sections = [heading, "## Overview",
+                    f"Mock output generated offline for the {agent} agent from prompt {source[:12] or 'n/a'}."]
+        if agent == 'product-spec' and task_input.get('iteration') == 0:
+            sections += ["## Features"] + [f"### Feature {i}: Mock Feature {i}" for i in range(1, self.features + 1)]
+        if agent == 'tech-lead':
+            if task_input.get('iteration', 1) >= self.ready_after:
+                sections += ["## Verdict", "READY FOR IMPLEMENTATION"]
+            else:
+                sections += ["## Questions", "1. Which edge cases need explicit handling?"]
+        rules = validation.rules_for(agent, requested)
+        if not (self.invalid_rate and random.Random(f"{self.seed}:invalid:{source}").random() < self.invalid_rate):
+            sections += [f"## {heading}" for heading in rules['headings'] if heading != 'Overview']
+            if rules.get('any_of') and not any(marker in "\n".join(sections) for marker in rules['any_of']):
+                sections += [f"**Status**: {rules['any_of'][-1]}"]
+        sections.append("## Details")
+        text = "\n\n".join(sections) + "\n\n"
+        line = 0
+        while len(text) < self.output_tokens * CHARS_PER_TOKEN:
+            line += 1
+            text += f"- Detail {line}: requirement, acceptance criterion or design note for {agent}.\n"
+        return text
+
+    def _should_fail(self, key):
+        with self._lock:
+            attempt = self._attempts[key] = self._attempts.get(key, 0) + 1
+        rng = random.Random(f"{self.seed}:{key}:{attempt}")
+        if self.error_rate and rng.random() < self.error_rate:
+            return simulated_error(rng.choice((429, 529)), self.retry_after)
+        if self.server_error_rate and rng.random() < self.server_error_rate:
+            return simulated_error(rng.choice((500, 503, 'connection', 'timeout')))
+        return None
+
+    def respond(self, params):
+        breakpoints = sum(1 for block in request_blocks(params) if block.get('cache_control'))
+        if breakpoints > MAX_CACHE_BREAKPOINTS:
+            raise simulated_error(400, message=f"A maximum of {MAX_CACHE_BREAKPOINTS} blocks with cache_control "
+                                               f"may be provided. Found {breakpoints}.")
+        key = request_key(params)
+        error = self._should_fail(key)
+        if error:
+            raise error
+
+        first_turn = params['messages'][0]['content']
+        first_text = first_turn if isinstance(first_turn, str) else "\n\n".join(b['text'] for b in first_turn)
+        match = TASK_INPUT_RE.search(first_text)
+        task_input = json.loads(match.group(1)) if match else {}
+        requested = SECTION_RE.findall(first_text)[:1]
+        # Keyed by prompt text only: a continuation adds cache breakpoints but writes the same document
+        initial = request_text(dict(params, messages=params['messages'][:1]))
+        full = self.document(self.identify_agent(params), task_input, hashlib.sha256(initial.encode()).hexdigest(),
+                             requested)
+
+        # A continuation carries the output so far as an assistant turn: carry on after it
+        assistant = [m['content'] for m in params['messages'] if m['role'] == 'assistant']
+        offset = 0
+        if assistant:
+            previous = assistant[-1] if isinstance(assistant[-1], str) else "".join(b['text'] for b in assistant[-1])
+            position = full.find(previous)
+            offset = position + len(previous) if position >= 0 else len(full)
+        remaining = full[offset:]
+
+        cap = min(params['max_tokens'], self.truncate_at or params['max_tokens']) * CHARS_PER_TOKEN
+        text, stop_reason = (remaining[:cap], 'max_tokens') if len(remaining) > cap else (remaining, 'end_turn')
+        output_tokens = len(text) // CHARS_PER_TOKEN + 1
+        latency = self.latency + (output_tokens / self.tps if self.tps else 0)
+        uncached, cache_write, cache_read = self._cache_usage(params)
+        response = make_response(text, stop_reason, uncached, output_tokens, cache_write, cache_read,
+                                 params.get('model'))
+        return response, latency
+
+    def _cache_usage(self, params):
+        """Simulated prompt caching: (uncached, cache write, cache read) input tokens. The prefix up to
+        a cache_control block is read if an earlier request wrote it, and written otherwise."""
+        digest = hashlib.sha256()
+        chars = read = cached_up_to = 0
+        with self._lock:
+            for block in request_blocks(params):
+                digest.update(block['text'].encode())
+                chars += len(block['text'])
+                if block.get('cache_control'):
+                    prefix = digest.hexdigest()
+                    if prefix in self._cached:
+                        read = chars
+                    self._cached.add(prefix)
+                    cached_up_to = chars
+        tokens = lambda n: n // CHARS_PER_TOKEN
+        return tokens(chars - cached_up_to) + 1, tokens(cached_up_to - read), tokens(read)
+
+
+class RecordingStore:
+    """One JSON file per request, named by request_key()."""
+
+    def __init__(self, root=None):
+        self.root = Path(root or os.environ.get('AGENT_RECORD_DIR', '.cache/recordings'))
+
+    def path(self, params):
+        return self.root / f"{request_key(params)}.json"
+
+    def save(self, params, response):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(params)
+        record = {'model': params.get('model'), 'max_tokens': params.get('max_tokens'),
+                  'prompt_chars': len(request_text(params)), 'response': response_dict(response)}
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(record, indent=2))
+        os.replace(tmp, path)
+
+    def load(self, params):
+        path = self.path(params)
+        if not path.exists():
+            raise FileNotFoundError(f"No recording for this request ({path.stem[:12]}) in {self.root} — "
+                                    f"record it first with AGENT_BACKEND=record")
+        data = json.loads(path.read_text())['response']
+        usage = data['usage']
+        return make_response(data['text'], data['stop_reason'], usage['input_tokens'], usage['output_tokens'],
+                             usage['cache_write'], usage['cache_read'], params.get('model'))
+
+
+class ReplayBackend:
+    def __init__(self, store=None):
+        self.store = store or RecordingStore()
+
+    def respond(self, params):
+        return self.store.load(params), 0.0
+
+
+# ---------------------------------------------------------------------------
+# Client adapters
+# ---------------------------------------------------------------------------
+
+class _LocalStream:
+    """Mimics client.messages.stream(): text_stream deltas, then get_final_message()."""
+
+    def __init__(self, backend, params):
+        self.backend = backend
+        self.params = params
+
+    def __enter__(self):
+        self.response, self.latency = self.backend.respond(self.params)
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        text = self.response.content[0].text
+        chunks = [text[i:i + STREAM_CHUNK] for i in range(0, len(text), STREAM_CHUNK)] or ['']
+        time.sleep(self.latency / (len(chunks) + 1))
+        for chunk in chunks:
+            time.sleep(self.latency / (len(chunks) + 1))
+            yield chunk
+
+    def get_final_message(self):
+        return self.response
+
+
+class _LocalMessages:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, **params):
+        response, latency = self.backend.respond(params)
+        time.sleep(latency)
+        return response
+
+    def stream(self, **params):
+        return _LocalStream(self.backend, params)
+
+    @property
+    def batches(self):
+        return _LocalBatches(self.backend)
+
+
+class _LocalBatches:
+    """Mimics client.messages.batches, answering each request with respond(). The requests are saved
+    under LOCAL_BATCH_DIR, so a batch submitted by an interrupted run can be resumed like a real one.
+    Like the API, the batch retries throttled and server errors itself, and a request that still
+    fails (a 400, or one replay has no recording of) gives an errored result, not a failed batch."""
+
+    _results = {}  # batch id -> results, once answered in this process
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, requests):
+        batch_id = 'msgbatch_local_' + os.urandom(12).hex()
+        LOCAL_BATCH_DIR.mkdir(parents=True, exist_ok=True)
+        (LOCAL_BATCH_DIR / f'{batch_id}.json').write_text(json.dumps(requests))
+        return self.retrieve(batch_id)
+
+    def _answer(self, params):
+        for attempt in range(1, BATCH_ATTEMPTS + 1):
+            try:
+                return SimpleNamespace(type='succeeded', message=self.backend.respond(params)[0])
+            except Exception as e:
+                status = getattr(e, 'status_code', None)
+                if isinstance(e, FileNotFoundError) or (status and status < 500 and status != 429) \
+                        or attempt == BATCH_ATTEMPTS:
+                    return SimpleNamespace(type='errored', error=SimpleNamespace(type='error', message=str(e)))
+
+    def results(self, batch_id):
+        if batch_id not in self._results:
+            requests = json.loads((LOCAL_BATCH_DIR / f'{batch_id}.json').read_text())
+            self._results[batch_id] = [SimpleNamespace(custom_id=request['custom_id'],
+                                                       result=self._answer(request['params']))
+                                       for request in requests]
+        return iter(self._results[batch_id])
+
+    def retrieve(self, batch_id):
+        results = list(self.results(batch_id))
+        succeeded = sum(1 for item in results if item.result.type == 'succeeded')
+        return SimpleNamespace(id=batch_id, processing_status='ended', request_counts=SimpleNamespace(
+            processing=0, succeeded=succeeded, errored=len(results) - succeeded, canceled=0, expired=0))
+
+
+class _AsyncLocalMessages:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def create(self, **params):
+        response, latency = self.backend.respond(params)
+        await asyncio.sleep(latency)
+        return response
+
+
+class LocalClient:
+    def __init__(self, backend):
+        self.messages = _LocalMessages(backend)
+
+
+class AsyncLocalClient:
+    def __init__(self, backend):
+        self.messages = _AsyncLocalMessages(backend)
+
+
+class _RecordingStream:
+    def __init__(self, manager, store, params):
+        self.manager = manager
+        self.store = store
+        self.params = params
+
+    def __enter__(self):
+        self.stream = self.manager.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self.manager.__exit__(*exc)
+
+    @property
+    def text_stream(self):
+        return self.stream.text_stream
+
+    def get_final_message(self):
+        response = self.stream.get_final_message()
+        self.store.save(self.params, response)
+        return response
+
+
+class _RecordingMessages:
+    """Passes calls through to the real client's messages resource, saving each response."""
+
+    def __init__(self, messages, store):
+        self._messages = messages
+        self._store = store
+
+    def create(self, **params):
+        response = self._messages.create(**params)
+        self._store.save(params, response)
+        return response
+
+    def stream(self, **params):
+        return _RecordingStream(self._messages.stream(**params), self._store, params)
+
+    def __getattr__(self, name):
+        return getattr(self._messages, name)
+
+
+class _AsyncRecordingMessages(_RecordingMessages):
+    async def create(self, **params):
+        response = await self._messages.create(**params)
+        self._store.save(params, response)
+        return response
+
+
+class RecordingClient:
+    def __init__(self, client, store=None, is_async=False):
+        self._client = client
+        store = store or RecordingStore()
+        self.messages = (_AsyncRecordingMessages if is_async else _RecordingMessages)(client.messages, store)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+_mock = None
+_mock_lock = threading.Lock()
+
+
+def _offline_backend(name):
+    global _mock
+    if name == 'replay':
+        return ReplayBackend()
+    with _mock_lock:
+        # Shared so attempt counters (and therefore injected errors) span every client in the process
+        if _mock is None:
+            _mock = MockBackend.from_env()
+    return _mock
+
+
+def _api_key():
+    api_key = os.environ.get('ANTHROPIC_API_KEY')
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY not set")
+    return api_key
+
+
+def get_client():
+    """Synchronous client for the configured backend. Retries are left to the caller (max_retries=0),
+    so every attempt goes through run-task's with_retries, the rate coordinator and telemetry."""
+    name = backend_name()
+    if name in OFFLINE_BACKENDS:
+        return LocalClient(_offline_backend(name))
+    from anthropic import Anthropic
+    client = Anthropic(api_key=_api_key(), max_retries=0)
+    return RecordingClient(client) if name == 'record' else client
+
+
+def get_async_client():
+    """Async client for the configured backend. Retries are left to the caller (max_retries=0)."""
+    name = backend_name()
+    if name in OFFLINE_BACKENDS:
+        return AsyncLocalClient(_offline_backend(name))
+    from anthropic import AsyncAnthropic
+    client = AsyncAnthropic(api_key=_api_key(), max_retries=0)
+    return RecordingClient(client, is_async=True) if name == 'record' else client
@@ -0,0 +1,82 @@
+"""
+Model routing — the model and max_tokens each pipeline task is sent with.
+
+pipeline.yml can set `model` (a tier name or a model id) and `max_tokens` on a stage, on a
+refinement loop's reviewer or responder, or on a parallel group's task. A top-level `models:`
+block sets them per agent and picks the policy for everything else:
+
+    models:
+      policy: auto              # fixed (default) | auto
+      agents:
+        spec-judge: strong
+      tiers:                    # added to (or overriding) DEFAULT_TIERS
+        strong: {model: claude-opus-4-5-20251101, max_tokens: 32000}
+
+A task's own setting wins, then its agent's, then the policy's, then the `standard` tier.
+The auto policy sends refinement-loop reviews (short question rounds, repeated up to
+max_iterations times per feature) to `fast`. Long-form synthesis goes to `strong`: stages
+generated by `sections`, and stages whose input lists many documents. Everything else gets
+`standard`.
+
+find-next-task resolves the routing when it loads the pipeline, and every task carries its
+model and max_tokens. The model is part of the task's fingerprint, so rerouting a stage
+re-runs its completed tasks. Telemetry records the model with each task's latency and
+cost, and report.py has a by-model table to compare them.
+"""
+MODEL = "claude-sonnet-4-5-20250929"  # the standard tier, and the default for anything unrouted
+MAX_TOKENS = 16000
+POLICIES = ('fixed', 'auto')
+DEFAULT_TIER = 'standard'
+DEFAULT_TIERS = {
+    # The same output ceiling on every tier: a cheaper model writes as long a document (a tech
+    # lead's question round runs to ~7.5k tokens), it just costs less per token
+    'fast': {'model': 'claude-haiku-4-5-20251001', 'max_tokens': MAX_TOKENS},
+    'standard': {'model': MODEL, 'max_tokens': MAX_TOKENS},
+    'strong': {'model': 'claude-opus-4-5-20251101', 'max_tokens': MAX_TOKENS},
+}
+# Template values that expand to every document of a kind (see find-next-task's resolve_value)
+MULTI_DOCUMENT_INPUTS = ('{{latest_feature_docs}}', '{{all_spec_files}}')
+
+
+def task_definitions(stage):
+    """(role, definition) for every dict in a stage that defines tasks."""
+    if stage['type'] == 'refinement-loop':
+        return [('reviewer', stage['reviewer']), ('responder', stage['responder'])]
+    if stage['type'] == 'parallel-group':
+        return [('task', task) for task in stage['tasks']]
+    if 'agent' in stage:
+        return [('task', stage)]
+    return []
+
+
+def auto_tier(definition, role):
+    if role == 'reviewer':
+        return 'fast'
+    if definition.get('sections') or any(value in MULTI_DOCUMENT_INPUTS
+                                         for value in definition.get('input', {}).values()):
+        return 'strong'
+    return None
+
+
+def route(pipeline, config=None):
+    """Set model and max_tokens on every task definition in the pipeline (in place) and return it."""
+    config = config or {}
+    policy = config.get('policy', 'fixed')
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown models policy '{policy}' (expected one of: {', '.join(POLICIES)})")
+    tiers = {**DEFAULT_TIERS, **config.get('tiers', {})}
+    agents = config.get('agents', {})
+
+    for stage in pipeline:
+        for role, definition in task_definitions(stage):
+            setting = (definition.get('model') or agents.get(definition['agent'])
+                       or (policy == 'auto' and auto_tier(definition, role)) or DEFAULT_TIER)
+            tier = tiers.get(setting, {'model': setting})
+            definition['model'] = tier['model']
+            definition['max_tokens'] = definition.get('max_tokens') or tier.get('max_tokens', MAX_TOKENS)
+    return pipeline
+
+
+def of(definition):
+    """The routing of a task definition: what its tasks are sent with."""
+    return {'model': definition.get('model', MODEL), 'max_tokens': definition.get('max_tokens', MAX_TOKENS)}
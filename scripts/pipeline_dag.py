@@ -0,0 +1,307 @@
+"""
+Task-level dependency DAG compiled from pipeline.yml.
+
+Every task is expanded from its stage and linked to the tasks that produce its declared inputs,
+so everything whose inputs exist is released together instead of stage by stage, and each
+feature's refinement chain advances independently of the others. Approval gates remain
+barriers: a gate waits for every task before it, and every task after it waits for the gate.
+
+A finished task whose input fingerprint no longer matches is stale and runnable again; everything
+downstream of it waits until it has re-run, then is re-checked against its own fingerprint.
+
+Runnable tasks are ordered by critical-path length (the longest chain of unfinished work that
+depends on them) so the work that gates the most downstream tasks starts first.
+"""
+import importlib
+from pathlib import Path
+
+import models
+
+finder = importlib.import_module('find-next-task')
+
+SPECS_DIR = 'docs/05-specs/'
+EXPLAIN_LIMIT = 6  # blockers listed per node before summarising the rest
+
+
+class Node:
+    """A task, gate, or virtual marker (e.g. 'feature refinement finished') in the DAG."""
+
+    def __init__(self, node_id, kind, stage, agent=None, output=None, task=None):
+        self.id = node_id
+        self.kind = kind          # 'task', 'gate' or 'marker'
+        self.stage = stage
+        self.agent = agent
+        self.output = output
+        self.task = task          # build_task() dict, filled in once the node is runnable
+        self.task_input = None    # fixed task input (refinement steps); otherwise resolved from declared
+        self.declared = {}        # raw input dict from pipeline.yml, formatted for this node
+        self.kwargs = {}          # substitution kwargs for resolve_input
+        self.paths_only = ()      # inputs whose file contents aren't fingerprinted (track_paths_only)
+        self.sections = None      # generate section by section (see sections.py)
+        self.route = None         # model and max_tokens (see models.py)
+        self.stale = False        # finished, but its inputs changed since
+        self.deps = set()
+        self.dependents = set()
+        self.done = False
+        self.reason = None        # why a gate/marker is not done yet
+        self.ready = False        # refinement markers: finished with the ready signal
+        self.priority = 0
+
+
+class PipelineDAG:
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.nodes = {}
+        self.refined = {}         # feature id -> marker node id
+        self.registry = finder.parse_feature_registry()
+        self._compile()
+
+    # -- construction -----------------------------------------------------
+
+    def add(self, node):
+        self.nodes[node.id] = node
+        return node
+
+    def add_task(self, stage, task_id, agent, output, declared, paths_only=(), sections=None, route=None, **kwargs):
+        node = self.add(Node(task_id, 'task', stage['id'], agent=agent, output=output))
+        node.declared = declared
+        node.paths_only = paths_only
+        node.sections = sections
+        node.route = route or models.of({})
+        node.kwargs = kwargs
+        node.done = finder.task_done(task_id, output)
+        return node
+
+    def _compile(self):
+        previous = []   # node ids of every stage before the current one
+        barrier = None  # most recent gate
+        for stage in self.pipeline:
+            start = len(self.nodes)
+            stage_type = stage['type']
+            if stage_type == 'gate':
+                self._add_gate(stage, previous)
+            elif stage_type == 'single':
+                self.add_task(stage, stage.get('task_id', stage['id']), stage['agent'], stage['output'],
+                              stage.get('input', {}), stage.get('track_paths_only', ()), stage.get('sections'),
+                              models.of(stage))
+            elif stage_type == 'parallel-group':
+                for sub in stage['tasks']:
+                    self.add_task(stage, sub['task_id'], sub['agent'], sub['output'], sub.get('input', {}),
+                                  sub.get('track_paths_only', ()), sub.get('sections'), models.of(sub))
+            elif stage_type == 'per-feature':
+                self._add_per_feature(stage)
+            elif stage_type == 'refinement-loop':
+                self._add_refinement(stage)
+
+            new_ids = list(self.nodes)[start:]
+            if barrier is not None and stage_type != 'gate':
+                for node_id in new_ids:
+                    self.link(node_id, barrier)
+            if stage_type == 'gate':
+                barrier = stage['id']
+            previous += new_ids
+
+        self._link_inputs()
+        self._check_fingerprints()
+        self._compute_priorities()
+
+    def _add_gate(self, stage, previous):
+        node = self.add(Node(stage['id'], 'gate', stage['id']))
+        node.reason = stage['message']
+        for node_id in previous:
+            self.link(stage['id'], node_id)
+        node.done = Path(stage['sentinel']).exists()
+        if stage['id'] == 'specs-approval' and not node.done and not self.blockers(node):
+            # Mirrors process_specs_gate: only closes once every feature is READY FOR IMPLEMENTATION
+            node.done = not all(self.nodes[m].ready for m in self.refined.values())
+
+    def _add_per_feature(self, stage):
+        if not self.registry:
+            # Features aren't known until the PRD exists — stand in for the whole stage
+            node = self.add(Node(f"{stage['id']}:*", 'marker', stage['id']))
+            node.reason = 'feature registry not available yet (PRD missing)'
+            return
+        for feature_id, feature in self.registry.items():
+            kwargs = {'feature_id': feature_id, 'feature_slug': feature['slug'], 'feature_name': feature['name']}
+            self.add_task(stage, stage['task_id'].format(**kwargs), stage['agent'],
+                          stage['output'].format(**kwargs), stage.get('input', {}),
+                          stage.get('track_paths_only', ()), stage.get('sections'), models.of(stage), **kwargs)
+
+    def _add_refinement(self, stage):
+        """Expand each feature's tech-lead/product-spec chain as far as files on disk allow."""
+        max_iter = stage.get('max_iterations', 5)
+        ready_signal = stage.get('ready_signal', 'READY FOR IMPLEMENTATION')
+        reviewer, responder = stage['reviewer'], stage['responder']
+
+        for feature_id, feature in self.registry.items():
+            feature_slug = feature['slug']
+            feature_file = f'docs/02-features/{feature_id}-{feature_slug}.md'
+            marker = self.add(Node(f'refined-{feature_id}', 'marker', stage['id']))
+            self.refined[feature_id] = marker.id
+            prev, prev_output = None, feature_file
+
+            for iteration in range(1, max_iter + 1):
+                kwargs = {'feature_id': feature_id, 'feature_slug': feature_slug, 'iteration': iteration}
+                q_output = reviewer['output'].format(**kwargs)
+                questions = self.add_task(stage, reviewer['task_id'].format(**kwargs), reviewer['agent'], q_output,
+                                          {'feature_doc': prev_output}, route=models.of(reviewer))
+                questions.task_input = {'feature_id': feature_id, 'feature': feature_slug,
+                                        'iteration': iteration, 'feature_doc': prev_output}
+                if prev:
+                    self.link(questions.id, prev)
+                prev = questions.id
+                if not Path(q_output).exists():
+                    break
+                if finder.get_index().contains(q_output, ready_signal):
+                    marker.done = marker.ready = True
+                    break
+
+                r_output = responder['output'].format(**kwargs)
+                refine = self.add_task(stage, responder['task_id'].format(**kwargs), responder['agent'], r_output,
+                                       {'feature_doc': feature_file, 'questions_file': q_output},
+                                       route=models.of(responder))
+                refine.task_input = {'feature_id': feature_id, 'feature': feature_slug, 'iteration': iteration,
+                                     'feature_doc': feature_file, 'questions_file': q_output}
+                self.link(refine.id, prev)
+                prev, prev_output = refine.id, r_output
+                if not Path(r_output).exists():
+                    break
+            else:
+                marker.done = True  # max iterations exhausted
+
+            self.link(marker.id, prev)
+            if not marker.done:
+                marker.reason = 'refinement in progress'
+
+    def link(self, node_id, dep_id):
+        if node_id == dep_id:
+            return
+        self.nodes[node_id].deps.add(dep_id)
+        self.nodes[dep_id].dependents.add(node_id)
+
+    def _link_inputs(self):
+        producers = {n.output: n.id for n in self.nodes.values() if n.output}
+        spec_producers = [n.id for n in self.nodes.values()
+                          if n.output and n.output.startswith(SPECS_DIR)
+                          and not Path(n.output).name.lower().startswith('spec-review')]
+        per_feature_markers = [n.id for n in self.nodes.values() if n.id.endswith(':*')]
+
+        for node in list(self.nodes.values()):
+            for value in node.declared.values():
+                if value == '{{latest_feature_docs}}':
+                    deps = list(self.refined.values()) + per_feature_markers
+                elif value in ('{{latest_feature_doc}}', '{{latest_questions_file}}'):
+                    deps = [self.refined.get(node.kwargs.get('feature_id'))]
+                elif value == '{{all_spec_files}}':
+                    deps = spec_producers + per_feature_markers
+                elif isinstance(value, str):
+                    deps = [producers.get(value.format(**node.kwargs) if node.kwargs else value)]
+                else:
+                    deps = []
+                for dep in deps:
+                    if dep:
+                        self.link(node.id, dep)
+
+    def _check_fingerprints(self):
+        """Reopen stale tasks, and hold back everything downstream of them until they have re-run.
+        Held-back nodes are re-checked on the next compile, once their inputs are final."""
+        stale = []
+        for node in self.nodes.values():
+            if node.kind == 'task' and node.done and finder.stale_inputs(
+                    node.id, node.agent, self.node_input(node), node.paths_only, node.route['model']):
+                node.done = False
+                node.stale = True
+                stale.append(node.id)
+
+        pending = [d for node_id in stale for d in self.nodes[node_id].dependents]
+        seen = set(stale)
+        while pending:
+            node_id = pending.pop()
+            node = self.nodes[node_id]
+            # Gates stay approved; tasks after one are reached through their own input links
+            if node_id in seen or node.kind == 'gate':
+                continue
+            seen.add(node_id)
+            if node.done:
+                node.done = False
+                node.reason = 'upstream inputs are being regenerated'
+            pending += node.dependents
+
+    def _compute_priorities(self):
+        """Critical-path length: unfinished tasks on the longest chain of dependents, including self."""
+        memo = {}
+
+        def length(node_id):
+            if node_id not in memo:
+                node = self.nodes[node_id]
+                weight = 1 if node.kind == 'task' and not node.done else 0
+                memo[node_id] = weight + max((length(d) for d in node.dependents), default=0)
+            return memo[node_id]
+
+        for node_id in self.nodes:
+            self.nodes[node_id].priority = length(node_id)
+
+    # -- queries ------------------------------------------------------------
+
+    def node_input(self, node):
+        """The task input a node runs with, resolved against the files on disk now."""
+        if node.task_input is not None:
+            return dict(node.task_input)
+        task_input = finder.resolve_input(node.declared, **node.kwargs)
+        if 'feature_id' in node.kwargs:
+            task_input['feature_id'] = node.kwargs['feature_id']
+            task_input['feature'] = node.kwargs['feature_slug']
+        return task_input
+
+    def blockers(self, node):
+        return sorted(d for d in node.deps if not self.nodes[d].done)
+
+    def runnable(self):
+        """Runnable task dicts across all stages, highest critical-path priority first."""
+        ready = [n for n in self.nodes.values()
+                 if n.kind == 'task' and not n.done and not self.blockers(n)]
+        ready.sort(key=lambda n: (-n.priority, n.id))
+        tasks = []
+        for node in ready:
+            node.task = finder.build_task(node.id, node.agent, node.output, self.node_input(node), node.sections,
+                                          node.route)
+            tasks.append((node.stage, node.task))
+        return tasks
+
+    def pending_gates(self):
+        return [n for n in self.nodes.values() if n.kind == 'gate' and not n.done and not self.blockers(n)]
+
+    def explain(self):
+        """Human-readable lines describing why each unfinished node isn't running."""
+        lines = []
+        for node in sorted(self.nodes.values(), key=lambda n: (-n.priority, n.id)):
+            if node.done:
+                continue
+            blockers = self.blockers(node)
+            if node.kind == 'task' and not blockers:
+                label = 'STALE    ' if node.stale else 'RUNNABLE '
+                lines.append(f"{label} {node.id} [{node.stage}] critical path {node.priority}")
+            elif node.kind == 'gate' and not blockers:
+                lines.append(f"GATE      {node.id}: {node.reason}")
+            elif blockers:
+                described = []
+                for dep_id in blockers[:EXPLAIN_LIMIT]:
+                    dep = self.nodes[dep_id]
+                    label = {'gate': 'awaiting approval', 'marker': dep.reason}.get(dep.kind, 'not finished')
+                    described.append(f"{dep_id} ({label})")
+                if len(blockers) > EXPLAIN_LIMIT:
+                    described.append(f"+{len(blockers) - EXPLAIN_LIMIT} more")
+                lines.append(f"BLOCKED   {node.id} [{node.stage}] by {', '.join(described)}")
+            else:
+                lines.append(f"WAITING   {node.id} [{node.stage}]: {node.reason}")
+        return lines
+
+
+def runnable_tasks(pipeline):
+    """Compile the DAG and return (dag, [(stage id, task), ...]) — tasks highest priority first."""
+    finder._pass_results.clear()
+    try:
+        dag = PipelineDAG(pipeline)
+        return dag, dag.runnable()
+    finally:
+        finder.get_index().save()
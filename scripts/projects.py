@@ -0,0 +1,205 @@
+"""
+Multi-project scheduling: one scheduler, one concurrency budget and one rate budget shared by
+several project roots, each with its own pipeline.yml and docs/.
+
+Every path in a pipeline is relative to its project root, so each project's work runs in
+subprocesses that work in that root. find-next-task.py lists what is runnable there, and each
+task runs in its own run-task.py. The scheduler only decides which project's task gets the
+next free slot:
+
+  fair      (default) weighted fair share: the project with the fewest running tasks per unit
+            of weight goes next, so one project's long queue can't starve the others
+  priority  projects in order of weight; a lower one only gets the slots the higher ones can't use
+
+Either way a slot no project can use goes to any project with work, so capacity never sits idle
+while something is runnable. Every child shares one rate coordinator file (see rate_limit.py).
+AGENT_RPM and AGENT_TPM are therefore budgets for all projects together, and a 429 in one
+project pauses them all.
+
+Roots are given as PATH or PATH:WEIGHT (default weight 1).
+The event stream (see events.py) is shared the same way, with each event tagged with its project.
+"""
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import events
+
+SCRIPTS = Path(__file__).parent
+FINDER = SCRIPTS / 'find-next-task.py'
+RUNNER = SCRIPTS / 'run-task.py'
+POLICIES = ('fair', 'priority')
+
+
+class Project:
+    """One project root and its scheduling state."""
+
+    def __init__(self, path, weight=1):
+        self.path = path                  # as given: tasks carry it, so it must stay valid for CI jobs
+        self.root = Path(path).resolve()
+        self.name = self.root.name
+        self.weight = weight
+        self.queue = []                   # runnable tasks not started yet
+        self.running = set()
+        self.failed = set()
+        self.completed = 0
+        self.gate = None                  # id of the approval gate it is waiting on
+        self.note = None                  # where the pipeline stands when nothing is runnable
+
+    @classmethod
+    def parse(cls, spec):
+        path, _, weight = spec.rpartition(':')
+        if path and weight.isdigit() and int(weight) > 0:
+            return cls(path, int(weight))
+        return cls(spec)
+
+
+def scan(project, use_dag=False, env=None):
+    """Refresh the project's queue, gate and note from find-next-task, run in the project root."""
+    result = subprocess.run([sys.executable, str(FINDER), *(['--dag'] if use_dag else [])],
+                            cwd=project.root, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"find-next-task failed in {project.root}:\n{result.stderr}")
+    outputs = dict(line.split('=', 1) for line in result.stdout.splitlines() if '=' in line)
+
+    tasks = json.loads(outputs.get('tasks', '[]'))
+    project.queue = [dict(task, root=project.path, weight=project.weight) for task in tasks
+                     if task['id'] not in project.running and task['id'] not in project.failed]
+    for task in project.queue:
+        events.emit('queued', task_id=task['id'], agent=task['agent'], project=project.name)
+    project.gate = outputs.get('gate')
+    if project.gate:
+        project.note = f"Stopped at gate: {project.gate}"
+    elif '# All stages complete' in result.stderr:
+        project.note = "All stages complete"
+    else:
+        project.note = None
+
+
+def interleave(projects):
+    """Every project's queue as one list, alternating between projects in proportion to weight."""
+    queues = {project.name: list(project.queue) for project in projects}
+    ordered = []
+    while any(queues.values()):
+        for project in projects:
+            queue = queues[project.name]
+            ordered += queue[:project.weight]
+            del queue[:project.weight]
+    return ordered
+
+
+def next_project(projects, policy='fair'):
+    """The project whose task should take the next free slot (None if nothing is queued)."""
+    waiting = [project for project in projects if project.queue]
+    if not waiting:
+        return None
+    if policy == 'priority':
+        return max(waiting, key=lambda project: project.weight)
+    return min(waiting, key=lambda project: (len(project.running) / project.weight, -project.weight))
+
+
+def shared_env(stream=None, use_cache=None, rpm=None, tpm=None):
+    """Environment for every child process: one rate coordinator file, wherever the project lives."""
+    env = dict(os.environ)
+    env['AGENT_RATE_FILE'] = str(Path(env.get('AGENT_RATE_FILE', '.cache/rate-limit.json')).resolve())
+    env['AGENT_EVENTS'] = events.shared_target()
+    if rpm:
+        env['AGENT_RPM'] = str(rpm)
+    if tpm:
+        env['AGENT_TPM'] = str(tpm)
+    if stream:
+        env['AGENT_STREAM'] = '1'
+    if use_cache is False:
+        env['AGENT_CACHE'] = 'off'
+    return env
+
+
+def run_task(project, task, env):
+    """Run one task in its project root, prefixing its output with the project name. Returns True on success."""
+    # run-task moves into the root the task is tagged with, resolved from this directory
+    child = subprocess.Popen([sys.executable, str(RUNNER)],
+                             env=dict(env, TASK_JSON=json.dumps(task), AGENT_PROJECT=project.name,
+                                      PYTHONUNBUFFERED='1'),
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    for line in child.stdout:
+        print(f"[{project.name}] {line}", end='', flush=True)
+    return child.wait() == 0
+
+
+def approve_gate(project):
+    """Write a gate's sentinel in the project, as a human approval would (dry runs only)."""
+    import importlib
+    finder = importlib.import_module('find-next-task')
+    pipeline = finder.load_pipeline(project.root / 'pipeline.yml')
+    stage = next(s for s in pipeline if s['id'] == project.gate)
+    sentinel = project.root / stage['sentinel']
+    sentinel.parent.mkdir(parents=True, exist_ok=True)
+    sentinel.touch()
+    print(f"✔️  [{project.name}] Auto-approved gate {project.gate} ({stage['sentinel']})")
+
+
+def run_projects(roots, max_workers=2, use_dag=False, approve_gates=False, policy='fair',
+                 stream=None, use_cache=None, rpm=None, tpm=None):
+    """Run every project's pipeline on one pool of max_workers task slots. Returns the exit code."""
+    projects = [Project.parse(root) for root in roots]
+    missing = [project.path for project in projects if not (project.root / 'pipeline.yml').exists()]
+    if missing:
+        print(f"# pipeline.yml not found in: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    names = [project.name for project in projects]
+    if len(set(names)) < len(names):
+        print(f"# Project roots need distinct directory names: {names}", file=sys.stderr)
+        return 1
+
+    env = shared_env(stream, use_cache, rpm, tpm)
+    print(f"🗂️  Scheduling {len(projects)} project(s) on {max_workers} shared slot(s) ({policy}): "
+          + ", ".join(f"{project.name} (weight {project.weight})" for project in projects))
+    events.emit('run_started', mode='projects', engine='threads', workers=max_workers, policy=policy,
+                projects=names)
+    for project in projects:
+        scan(project, use_dag, env)
+
+    in_flight = {}  # future -> (project, task)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            if approve_gates:
+                for project in projects:
+                    if project.gate and not project.running and not project.queue:
+                        approve_gate(project)
+                        scan(project, use_dag, env)
+
+            while len(in_flight) < max_workers and (project := next_project(projects, policy)):
+                task = project.queue.pop(0)
+                project.running.add(task['id'])
+                print(f"▶️  [{project.name}] starting {task['id']} ({task['agent']})")
+                in_flight[pool.submit(run_task, project, task, env)] = (project, task)
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            finished = {}
+            for future in done:
+                project, task = in_flight.pop(future)
+                project.running.discard(task['id'])
+                finished[project.name] = project
+                if future.result():
+                    project.completed += 1
+                else:
+                    project.failed.add(task['id'])
+                    print(f"❌ [{project.name}] Task {task['id']} failed — not retrying in this run")
+            for project in finished.values():
+                scan(project, use_dag, env)
+
+    events.emit('run_finished', completed=sum(p.completed for p in projects),
+                failed=sum(len(p.failed) for p in projects),
+                note='; '.join(f"{p.name}: {p.note or 'stopped'}" for p in projects))
+    print(f"\n# Scheduler finished: {sum(p.completed for p in projects)} task(s) completed, "
+          f"{sum(len(p.failed) for p in projects)} failed", file=sys.stderr)
+    for project in projects:
+        status = f"Failed: {sorted(project.failed)}" if project.failed else project.note or "Stopped"
+        print(f"#   {project.name}: {project.completed} completed — {status}", file=sys.stderr)
+    return 1 if any(project.failed for project in projects) else 0
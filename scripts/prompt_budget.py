@@ -0,0 +1,144 @@
+"""
+Context-window budgeting for agent prompts.
+
+load_agent_prompt hands every shared document to fit(). When the estimated prompt size exceeds
+the budget, documents are condensed one at a time, least important to the agent first (largest
+first among equals). The first tier is a summary, then an outline of headings if that still isn't
+enough. Each task's own documents (its feature doc, questions file) are always sent in full.
+
+Summaries are produced by the LLM once per document version. They are stored under
+docs/.state/summaries/ keyed by a hash of the source text and reused by every later prompt and
+every later run.
+
+Configuration (environment):
+  AGENT_PROMPT_BUDGET   input-token budget per prompt (default: 150000)
+"""
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+
+SUMMARY_DIR = Path('docs/.state/summaries')
+DEFAULT_BUDGET = 150_000  # tokens — leaves room for output and estimate error in a 200k window
+CHARS_PER_TOKEN = 4
+TIERS = ('full', 'summary', 'outline')
+
+# Inputs each agent can least afford to lose, most important first. Shared inputs not listed
+# are condensed before listed ones.
+PRIORITIES = {
+    'foundation-architect': ['feature_docs'],
+    'appsec': ['foundation_doc', 'feature_docs'],
+    'qa': ['foundation_doc', 'feature_docs'],
+    'engineering-spec': ['foundation_spec', 'foundation_doc', 'appsec_doc', 'qa_doc'],
+    'spec-judge': ['spec_files'],
+    'implementation-guide': ['spec_files', 'foundation_doc', 'appsec_doc', 'prd_file'],
+}
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 chars/token), good enough to budget before sending."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def get_budget():
+    return int(os.environ.get('AGENT_PROMPT_BUDGET', DEFAULT_BUDGET))
+
+
+def outline(text):
+    """Headings only — the cheapest tier, no LLM call needed."""
+    return "\n".join(line for line in text.splitlines() if re.match(r'#{1,4}\s', line))
+
+
+class Document:
+    """One shared input section, rendered at its current tier."""
+
+    def __init__(self, key, label, path, text):
+        self.key = key
+        self.label = label
+        self.path = path
+        self.text = text
+        self.tier = 'full'
+        self.body = text
+
+    def render(self):
+        suffix = '' if self.tier == 'full' else f' ({self.tier})'
+        return f"## {self.label}{suffix}\n\n{self.body}"
+
+    @property
+    def tokens(self):
+        return estimate_tokens(self.render())
+
+
+class SummaryStore:
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, root=SUMMARY_DIR):
+        self.root = Path(root)
+
+    def lock(self, text):
+        """Per-document lock, so concurrent tasks needing the same summary make one LLM call."""
+        with self._locks_guard:
+            return self._locks.setdefault(self.path(text).name, threading.Lock())
+
+    def path(self, text):
+        return self.root / f"{hashlib.sha256(text.encode()).hexdigest()[:32]}.md"
+
+    def get(self, text):
+        path = self.path(text)
+        return path.read_text() if path.exists() else None
+
+    def put(self, text, summary):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(text)
+        tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+        tmp.write_text(summary)
+        os.replace(tmp, path)
+
+
+def condense_order(agent, documents):
+    """Documents in the order they should be condensed: lowest priority first, then largest."""
+    ranked = PRIORITIES.get(agent, [])
+    rank = lambda doc: ranked.index(doc.key) if doc.key in ranked else -1
+    return sorted(documents, key=lambda doc: (rank(doc), -doc.tokens))
+
+
+def fit(agent, documents, fixed_tokens, summarize=None, budget=None, store=None):
+    """Condense documents in place until the prompt fits the budget.
+
+    fixed_tokens covers everything that is never condensed (agent prompt, per-task documents).
+    summarize(label, text) produces a summary with the LLM; without it only outlines are used.
+    Returns {label: tier} for every condensed document.
+    """
+    budget = budget or get_budget()
+    store = store or SummaryStore()
+    total = lambda: fixed_tokens + sum(doc.tokens for doc in documents)
+    if total() <= budget:
+        return {}
+
+    print(f"📏 Prompt for {agent} is ~{total():,} tokens, over the {budget:,} budget — condensing inputs")
+    for tier in TIERS[1:]:
+        for doc in condense_order(agent, documents):
+            if total() <= budget:
+                break
+            if TIERS.index(doc.tier) >= TIERS.index(tier):
+                continue
+            if tier == 'summary':
+                if summarize is None:
+                    continue
+                with store.lock(doc.text):
+                    summary = store.get(doc.text)
+                    if summary is None:
+                        print(f"📝 Summarizing {doc.label} ({doc.path})")
+                        summary = summarize(doc.label, doc.text)
+                        store.put(doc.text, summary)
+                body = summary
+            else:
+                body = outline(doc.text)
+            if len(body) < len(doc.body):
+                doc.body, doc.tier = body, tier
+
+    if total() > budget:
+        print(f"⚠️  Prompt for {agent} is still ~{total():,} tokens after condensing every shared input")
+    return {doc.label: doc.tier for doc in documents if doc.tier != 'full'}
@@ -0,0 +1,192 @@
+"""
+Rate-limit handling shared by every worker on a machine.
+
+- backoff_delay() honours the server's retry-after / anthropic-ratelimit-*-reset headers and
+  falls back to a jittered exponential schedule, so workers that were throttled together
+  don't all retry at the same moment.
+- RateCoordinator is a token bucket plus a shared "paused until" timestamp kept in a small
+  JSON file guarded by an exclusive file lock. Every worker calls it before sending. When one
+  worker is throttled it pauses the rest, instead of each of them running into the same limit.
+  With a token budget, each response's tokens are charged afterwards; a worker that finds the
+  budget overdrawn waits until it has refilled.
+
+Configuration (environment):
+  AGENT_RATE_FILE   coordinator state file (default: .cache/rate-limit.json)
+  AGENT_RPM         shared requests-per-minute budget; unset = only coordinate pauses
+  AGENT_TPM         shared input+output tokens-per-minute budget; unset = no token budget
+"""
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to per-process pacing only
+    fcntl = None
+
+RESET_HEADERS = (
+    'anthropic-ratelimit-requests-reset',
+    'anthropic-ratelimit-input-tokens-reset',
+    'anthropic-ratelimit-output-tokens-reset',
+    'anthropic-ratelimit-tokens-reset',
+)
+MAX_DELAY = 300  # seconds — never wait longer than this on a single retry
+
+
+def _headers(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'headers', None) or {}
+
+
+def server_retry_after(error, now=None):
+    """Seconds the server asked us to wait, from retry-after or the rate-limit reset headers."""
+    headers = _headers(error)
+    now = now or time.time()
+
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get('retry-after')
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - now)
+            except (TypeError, ValueError):
+                pass
+
+    resets = []
+    for name in RESET_HEADERS:
+        value = headers.get(name)
+        if not value:
+            continue
+        try:
+            reset = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            continue
+        if reset.tzinfo is None:
+            reset = reset.replace(tzinfo=timezone.utc)
+        resets.append(reset.timestamp() - now)
+    return max(resets) if resets and max(resets) > 0 else None
+
+
+def backoff_delay(attempt, error=None, base_delays=(60, 120, 240)):
+    """Delay before retry number `attempt` (1-based).
+
+    Uses the server's hint plus up to 20% jitter when present; otherwise "equal jitter" on the
+    exponential schedule — half the nominal delay, plus a random share of the other half.
+    """
+    hint = server_retry_after(error) if error is not None else None
+    if hint is not None:
+        return min(MAX_DELAY, hint + random.uniform(0, max(1.0, hint * 0.2)))
+    nominal = base_delays[min(attempt, len(base_delays)) - 1]
+    return min(MAX_DELAY, nominal / 2 + random.uniform(0, nominal / 2))
+
+
+class RateCoordinator:
+    """Cross-process token bucket and shared pause, stored in a lock-protected JSON file."""
+
+    def __init__(self, path='.cache/rate-limit.json', rpm=None, tpm=None):
+        self.path = Path(path)
+        self.rpm = rpm
+        self.tpm = tpm
+
+    @classmethod
+    def from_env(cls):
+        rpm, tpm = os.environ.get('AGENT_RPM'), os.environ.get('AGENT_TPM')
+        return cls(os.environ.get('AGENT_RATE_FILE', '.cache/rate-limit.json'),
+                   int(rpm) if rpm else None, int(tpm) if tpm else None)
+
+    def _update(self, change):
+        """Apply change(state, now) under an exclusive lock and return its result."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a+') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}
+                result = change(state, time.time())
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return result
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_acquire(self):
+        """Take a request slot. Returns 0 if granted, otherwise seconds to wait before trying again."""
+        def change(state, now):
+            paused_until = state.get('paused_until', 0)
+            if now < paused_until:
+                return paused_until - now
+            if self.tpm:
+                budget = self._refill_tokens(state, now)
+                if budget < 0:
+                    return -budget / (self.tpm / 60)
+            if not self.rpm:
+                return 0
+            rate = self.rpm / 60
+            tokens = min(self.rpm, state.get('tokens', self.rpm) + (now - state.get('updated', now)) * rate)
+            state['updated'] = now
+            if tokens >= 1:
+                state['tokens'] = tokens - 1
+                return 0
+            state['tokens'] = tokens
+            return (1 - tokens) / rate
+        return self._update(change)
+
+    def acquire(self):
+        """Block until a request slot is available. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def _refill_tokens(self, state, now):
+        """Token budget left now; it refills at tpm/60 per second up to tpm, and may be negative."""
+        refill = (now - state.get('token_updated', now)) * self.tpm / 60
+        budget = min(self.tpm, state.get('token_budget', self.tpm) + refill)
+        state['token_budget'], state['token_updated'] = budget, now
+        return budget
+
+    def spend(self, tokens):
+        """Charge a response's tokens to the token budget (no-op without one)."""
+        if not self.tpm or not tokens:
+            return
+        def change(state, now):
+            state['token_budget'] = self._refill_tokens(state, now) - tokens
+        self._update(change)
+
+    def pause(self, seconds):
+        """Hold every worker back for `seconds` (extends, never shortens, an existing pause)."""
+        def change(state, now):
+            state['paused_until'] = max(state.get('paused_until', 0), now + seconds)
+            state['throttle_events'] = state.get('throttle_events', 0) + 1
+        self._update(change)
+
+
+_coordinator = None
+
+
+def get_coordinator():
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = RateCoordinator.from_env()
+    return _coordinator
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Aggregate task telemetry (docs/.state/telemetry/*.jsonl) into a run report:
+latency percentiles, token totals and estimated cost by stage, agent, model and feature,
+plus the slowest per-feature chain.
+"""
+import argparse
+import importlib
+import json
+import math
+import re
+import sys
+from collections import defaultdict
+
+import telemetry
+
+finder = importlib.import_module('find-next-task')
+
+TOTAL_KEYS = ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens',
+              'retry_wait_seconds', 'cost_usd')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def stage_matchers(pipeline):
+    """(stage id, compiled regex) for every task_id template in the pipeline."""
+    matchers = []
+    for stage in pipeline or []:
+        templates = [stage.get('task_id', stage['id'])]
+        templates += [sub['task_id'] for sub in stage.get('tasks', [])]
+        templates += [stage[role]['task_id'] for role in ('reviewer', 'responder') if role in stage]
+        for template in templates:
+            pattern = re.sub(r'\\\{(\w+)\\\}', r'(?P<\1>.+?)', re.escape(template))
+            matchers.append((stage['id'], re.compile(f'^{pattern}$')))
+    return matchers
+
+
+def stage_of(task_id, matchers):
+    for stage_id, regex in matchers:
+        if regex.match(task_id):
+            return stage_id
+    return 'unknown'
+
+
+def summarize(records):
+    seconds = [r['seconds'] for r in records if r.get('seconds') is not None]
+    summary = {
+        'tasks': len(records),
+        'failed': sum(1 for r in records if r.get('status') == 'failed'),
+        'cache_hits': sum(1 for r in records if r.get('cache_hit')),
+        'p50_seconds': percentile(seconds, 50),
+        'p95_seconds': percentile(seconds, 95),
+        'total_seconds': round(sum(seconds), 1),
+    }
+    for key in TOTAL_KEYS:
+        summary[key] = round(sum(r.get(key) or 0 for r in records), 4)
+    return summary
+
+
+def build_report(records, pipeline):
+    matchers = stage_matchers(pipeline)
+    groups = {'stage': defaultdict(list), 'agent': defaultdict(list), 'model': defaultdict(list),
+              'feature': defaultdict(list)}
+    for record in records:
+        record.setdefault('stage', stage_of(record['task_id'], matchers))
+        groups['stage'][record['stage']].append(record)
+        groups['agent'][record['agent']].append(record)
+        groups['model'][record.get('model') or 'unknown'].append(record)
+        if record.get('feature_id'):
+            groups['feature'][record['feature_id']].append(record)
+
+    report = {'total': summarize(records)}
+    for name, grouped in groups.items():
+        report[f'by_{name}'] = {key: summarize(recs) for key, recs in sorted(grouped.items())}
+
+    chains = {feature: sum(r.get('seconds') or 0 for r in recs) for feature, recs in groups['feature'].items()}
+    if chains:
+        slowest = max(chains, key=chains.get)
+        report['slowest_chain'] = {
+            'feature_id': slowest,
+            'seconds': round(chains[slowest], 1),
+            'tasks': [r['task_id'] for r in sorted(groups['feature'][slowest], key=lambda r: r['started_at'])],
+        }
+    return report
+
+
+def fmt(value, spec):
+    return '-' if value is None else format(value, spec)
+
+
+def print_table(title, rows):
+    print(f"\n## {title}\n")
+    print(f"{'':32} {'tasks':>5} {'fail':>4} {'p50 s':>8} {'p95 s':>8} {'in tok':>10} {'out tok':>9} "
+          f"{'cache rd':>9} {'wait s':>7} {'cost $':>8}")
+    for key, s in rows.items():
+        print(f"{key[:32]:32} {s['tasks']:>5} {s['failed']:>4} {fmt(s['p50_seconds'], '8.1f')} "
+              f"{fmt(s['p95_seconds'], '8.1f')} {s['input_tokens']:>10,.0f} {s['output_tokens']:>9,.0f} "
+              f"{s['cache_read_tokens']:>9,.0f} {s['retry_wait_seconds']:>7,.0f} {s['cost_usd']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--run', help='only include records from this run id')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    records = telemetry.load_records()
+    if args.run:
+        records = [r for r in records if r['run_id'] == args.run]
+    if not records:
+        print("# No telemetry records found", file=sys.stderr)
+        return 1
+
+    report = build_report(records, finder.load_pipeline())
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print_table('Total', {'all tasks': report['total']})
+    print_table('By stage', report['by_stage'])
+    print_table('By agent', report['by_agent'])
+    print_table('By model', report['by_model'])
+    if report['by_feature']:
+        print_table('By feature', report['by_feature'])
+    if 'slowest_chain' in report:
+        chain = report['slowest_chain']
+        print(f"\nSlowest chain: {chain['feature_id']} — {chain['seconds']}s across {len(chain['tasks'])} task(s)")
+        print(f"  {' → '.join(chain['tasks'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
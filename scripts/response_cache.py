@@ -0,0 +1,93 @@
+"""
+Content-addressed on-disk cache of agent responses.
+Keyed by a hash of the fully assembled prompt, model and max_tokens, so re-running a task whose
+inputs haven't changed (after a sentinel reset or deleting an output) costs no LLM call.
+
+Configuration (environment):
+  AGENT_CACHE=off               bypass the cache entirely
+  AGENT_CACHE_DIR               cache location (default: .cache/responses)
+  AGENT_CACHE_MAX_MB            evict least-recently-used entries above this size (default: 500)
+  AGENT_CACHE_MAX_AGE_DAYS      entries older than this are ignored and evicted (default: 30)
+
+The cache is always bypassed with an offline backend (AGENT_BACKEND=mock/replay), so simulated
+output can never be served to a real run.
+"""
+import hashlib
+import os
+import time
+from pathlib import Path
+
+from llm_backends import is_offline
+
+
+def cache_key(prompt, model, max_tokens):
+    digest = hashlib.sha256()
+    for part in (model, str(max_tokens), prompt):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, root='.cache/responses', max_bytes=500 * 1024 * 1024, max_age=30 * 86400):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            root=os.environ.get('AGENT_CACHE_DIR', '.cache/responses'),
+            max_bytes=int(float(os.environ.get('AGENT_CACHE_MAX_MB', 500)) * 1024 * 1024),
+            max_age=float(os.environ.get('AGENT_CACHE_MAX_AGE_DAYS', 30)) * 86400,
+        )
+
+    def _path(self, key):
+        return self.root / key[:2] / f'{key}.md'
+
+    def get(self, key):
+        path = self._path(key)
+        if not path.exists():
+            return None
+        if time.time() - path.stat().st_mtime > self.max_age:
+            path.unlink(missing_ok=True)
+            return None
+        path.touch()  # mtime doubles as last-used time for LRU eviction
+        return path.read_text()
+
+    def put(self, key, output):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+        tmp.write_text(output)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for path in self.root.glob('*/*.md'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # evicted concurrently by another worker
+                continue
+            if now - stat.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def open_cache(enabled=None):
+    """Return the configured cache, or None when bypassed (enabled=False, AGENT_CACHE=off or an offline backend)."""
+    if is_offline():
+        return None
+    if enabled is None:
+        enabled = os.environ.get('AGENT_CACHE', 'on').lower() not in ('off', '0', 'false')
+    return ResponseCache.from_env() if enabled else None
@@ -2,135 +2,381 @@
 """
 Run a single task: load agent prompt, call LLM, save output, write completion sentinel.
 Parallel-safe: reads task from TASK_JSON env var, writes only to task-specific files.
+With --pool (worker pool) or --batch (Message Batches) it runs the whole TASKS_JSON list instead.
+--root PATH (or a task's "root", see find-next-task --root) runs it in that project.
+The anthropic SDK is imported on the first request sent, so tasks answered from the response
+cache or skipped as up to date never pay for it.
 """
 import json
 import os
+import re
 import sys
 import time
 import argparse
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from anthropic import Anthropic, RateLimitError, APIStatusError
 
-
-def load_agent_prompt(agent, task_input):
-    """Load agent prompt and inject task input."""
-    prompt_file = Path(f'agents/{agent}/prompt.md')
-    if not prompt_file.exists():
-        raise FileNotFoundError(f"Agent prompt not found: {prompt_file}")
-
-    with open(prompt_file) as f:
-        prompt = f.read()
-
-    # Inject referenced file contents
-    file_keys = {
-        'user_idea_file': 'User Idea',
-        'prd_file': 'PRD',
-        'feature_doc': 'Feature Document',
-        'questions_file': 'Tech Lead Questions',
-        'tech_lead_review': 'Tech Lead Review (READY FOR IMPLEMENTATION)',
-        'foundation_doc': 'Foundation Analysis',
-    }
-    optional_keys = {'tech_lead_review'}
+import fingerprints
+import models
+import llm_backends
+import prompt_budget
+import rate_limit
+import sections
+import speculation
+import telemetry
+import validation
+from continuation import Continuation
+from response_cache import cache_key, open_cache
+
+MODEL = models.MODEL  # default model, for tasks without their own (see models.py)
+MAX_TOKENS = models.MAX_TOKENS
+RETRY_DELAYS = [60, 120, 240]  # fallback backoff (jittered) when the server sends no retry-after
+TRANSIENT_DELAYS = [2, 8, 30]  # the same for 5xx, dropped connections and timeouts
+SECTION_WORKERS = 4  # parallel section requests per task
+VALIDATION_RETRIES = 1  # regenerations of a task whose output fails validation, in the same run
+JUDGE_MAX_TOKENS = 2000
+JUDGE_REPLY_FORMAT = ('Reply with only a JSON object: {"result": "PASS" or "FAIL", "score": 0-100, '
+                      '"issues": ["one line per problem that must be fixed"]}')
+SUMMARY_MAX_TOKENS = 2000
+SUMMARY_PROMPT = (
+    "Summarize the document below for an engineer who will not see the original. Keep every requirement, "
+    "decision, constraint, data entity, API and open question; drop prose and repetition. Keep the "
+    "document's headings. Reply with the summary only."
+)
+
+
+# Documents that are identical across the tasks of a stage (and often across stages).
+# They are sent first, ahead of the agent prompt, so the prefix can be served from the prompt cache.
+SHARED_FILE_KEYS = {
+    'prd_file': 'PRD',
+    'foundation_doc': 'Foundation Analysis',
+    'foundation_spec': 'Foundation Specification',
+    'appsec_doc': 'AppSec Review',
+    'qa_doc': 'QA Review',
+}
+# Per-task documents — sent last, after the cache breakpoints
+TASK_FILE_KEYS = {
+    'user_idea_file': 'User Idea',
+    'feature_doc': 'Feature Document',
+    'questions_file': 'Tech Lead Questions',
+    'tech_lead_review': 'Tech Lead Review (READY FOR IMPLEMENTATION)',
+}
+OPTIONAL_FILE_KEYS = {'tech_lead_review', 'foundation_spec', 'appsec_doc', 'qa_doc'}
+
+
+def text_block(text, cache=False):
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def file_documents(task_input, file_keys):
+    documents = []
     for key, label in file_keys.items():
         if key in task_input:
             path = Path(task_input[key])
             if path.exists():
-                prompt += f"\n\n## {label}\n\n"
-                prompt += path.read_text()
-            elif key not in optional_keys:
+                documents.append(prompt_budget.Document(key, label, str(path), path.read_text()))
+            elif key not in OPTIONAL_FILE_KEYS:
                 raise FileNotFoundError(f"Input file not found for '{key}': {path}")
+    return documents
 
-    # Inject list of feature documents (foundation-architect)
-    for i, doc_path in enumerate(task_input.get('feature_docs', []), 1):
-        path = Path(doc_path)
-        if path.exists():
-            prompt += f"\n\n## Feature Document {i}: {path.stem}\n\n"
-            prompt += path.read_text()
-        else:
-            raise FileNotFoundError(f"Feature doc not found: {path}")
 
-    # Inject list of engineering spec files (spec-judge)
-    for i, doc_path in enumerate(task_input.get('spec_files', []), 1):
+def list_documents(key, paths, label, kind):
+    documents = []
+    for i, doc_path in enumerate(paths, 1):
         path = Path(doc_path)
-        if path.exists():
-            prompt += f"\n\n## Engineering Spec {i}: {path.stem}\n\n"
-            prompt += path.read_text()
-        else:
-            raise FileNotFoundError(f"Spec file not found: {path}")
+        if not path.exists():
+            raise FileNotFoundError(f"{kind} not found: {path}")
+        documents.append(prompt_budget.Document(key, f"{label} {i}: {path.stem}", str(path), path.read_text()))
+    return documents
 
-    # Always inject tech stack context
-    tech_stack = Path('context/tech-stack-standards.md')
-    if tech_stack.exists():
-        prompt += "\n\n## Tech Stack Standards\n\n"
-        prompt += tech_stack.read_text()
 
-    prompt += "\n\n## Task Input\n\n```json\n"
-    prompt += json.dumps(task_input, indent=2)
-    prompt += "\n```\n"
+def load_agent_prompt(agent, task_input, summarize=None):
+    """Load agent prompt and inject task input.
 
-    return prompt
+    Returns {'system': [...], 'content': [...]} content blocks ordered for prompt caching:
+    tech stack and shared documents first, then the agent prompt, each closed by a cache
+    breakpoint; per-task documents and the task input JSON go in the user turn.
+    Shared documents are condensed to fit the prompt budget (see prompt_budget); summaries
+    come from summarize(label, text), by default summarize_document.
+    """
+    prompt_file = Path(f'agents/{agent}/prompt.md')
+    if not prompt_file.exists():
+        raise FileNotFoundError(f"Agent prompt not found: {prompt_file}")
 
+    with open(prompt_file) as f:
+        agent_prompt = f.read()
 
-def call_agent(agent, prompt):
-    """Call LLM with agent prompt. Retries on rate limit errors with exponential backoff."""
-    api_key = os.environ.get('ANTHROPIC_API_KEY')
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY not set")
+    fixed = []
+    tech_stack = Path('context/tech-stack-standards.md')
+    if tech_stack.exists():
+        fixed.append(f"## Tech Stack Standards\n\n{tech_stack.read_text()}")
+    shared = file_documents(task_input, SHARED_FILE_KEYS)
+    # Feature documents (foundation-architect, appsec, qa) and spec files (spec-judge, implementation-guide)
+    shared += list_documents('feature_docs', task_input.get('feature_docs', []), 'Feature Document', 'Feature doc')
+    shared += list_documents('spec_files', task_input.get('spec_files', []), 'Engineering Spec', 'Spec file')
+
+    per_task = [doc.render() for doc in file_documents(task_input, TASK_FILE_KEYS)]
+    per_task.append(f"## Task Input\n\n```json\n{json.dumps(task_input, indent=2)}\n```\n")
+
+    fixed_tokens = prompt_budget.estimate_tokens("\n\n".join(fixed + per_task + [agent_prompt]))
+    condensed = prompt_budget.fit(agent, shared, fixed_tokens, summarize or summarize_document)
+    if condensed:
+        telemetry.current().set(condensed_inputs=condensed)
+
+    sections = fixed + [doc.render() for doc in shared]
+    system = []
+    if sections:
+        system.append(text_block("# Shared Context\n\n" + "\n\n".join(sections), cache=True))
+    system.append(text_block(agent_prompt, cache=True))
+    return {"system": system, "content": [text_block("\n\n".join(per_task))]}
+
+
+def prompt_text(prompt):
+    """Flatten a prompt (plain string or content blocks) into one string — used for hashing and estimates."""
+    if isinstance(prompt, str):
+        return prompt
+    return "\n\n".join(block["text"] for block in prompt["system"] + prompt["content"])
+
+
+def request_params(prompt, messages=None):
+    """messages.create/stream keyword arguments for a prompt, optionally with continuation turns appended."""
+    if isinstance(prompt, str):
+        params = {"messages": [{"role": "user", "content": prompt}]}
+    else:
+        content = prompt["content"]
+        if messages and not any("cache_control" in block for block in content):
+            # Re-sent with continuation turns: cache the task's own content too, unless a block of it
+            # already is (sections.section_prompts), which would take the request over 4 breakpoints
+            content = content[:-1] + [dict(content[-1], cache_control={"type": "ephemeral"})]
+        params = {"system": prompt["system"], "messages": [{"role": "user", "content": content}]}
+    params["messages"] += messages or []
+    return params
+
+
+def log_cache_usage(usage):
+    """Print prompt-cache read/write token counts from a response's usage block."""
+    read = getattr(usage, 'cache_read_input_tokens', None) or 0
+    written = getattr(usage, 'cache_creation_input_tokens', None) or 0
+    print(f"💾 Prompt cache: {read} tokens read, {written} written, {usage.input_tokens} uncached input")
+
+
+def note_response(response, budgeted=True):
+    """Log cache usage, record tokens/stop reason for the running task's telemetry and charge the
+    tokens to the shared AGENT_TPM budget (budgeted=False for batch results, which have their own limits)."""
+    usage = response.usage
+    log_cache_usage(usage)
+    telemetry.current().usage(usage, response.stop_reason, getattr(response, 'model', None))
+    if budgeted:
+        rate_limit.get_coordinator().spend(
+            usage.input_tokens + (getattr(usage, 'cache_creation_input_tokens', None) or 0) + usage.output_tokens)
+
+
+def task_route(task):
+    """(model, max_tokens) a task dict is sent with: its own routing (see models.py), or the defaults."""
+    return task.get('model') or MODEL, task.get('max_tokens') or MAX_TOKENS
+
+
+def get_client():
+    """Client for the backend selected by AGENT_BACKEND (see llm_backends)."""
+    return llm_backends.get_client()
+
+
+def summarize_document(label, text):
+    """Condensed version of a document for prompts that exceed the budget (cached by prompt_budget)."""
+    client = get_client()
+    response = with_retries(lambda: client.messages.create(
+        model=MODEL,
+        max_tokens=SUMMARY_MAX_TOKENS,
+        system=[text_block(SUMMARY_PROMPT)],
+        messages=[{"role": "user", "content": f"# {label}\n\n{text}"}]
+    ))
+    note_response(response)
+    return response.content[0].text
+
+
+def retry_kind(error):
+    """How a failed request is retried: 'throttled' (429/529 — every worker backs off), 'transient'
+    (other 5xx, dropped connections and timeouts — only this request waits) or None (not retried)."""
+    from anthropic import APIConnectionError, APIStatusError, RateLimitError
+
+    if isinstance(error, RateLimitError) or getattr(error, 'status_code', None) == 529:
+        return 'throttled'
+    if isinstance(error, APIConnectionError) or (isinstance(error, APIStatusError) and error.status_code >= 500):
+        return 'transient'
+    return None
+
+
+def attempt_outcome(error):
+    """Telemetry outcome of a failed attempt: rate_limited, overloaded, http_<status>, timeout or connection_error."""
+    from anthropic import APITimeoutError
+
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return {429: 'rate_limited', 529: 'overloaded'}.get(status, f'http_{status}')
+    return 'timeout' if isinstance(error, APITimeoutError) else 'connection_error'
+
+
+def with_retries(send, on_retry=None):
+    """Call send(), retrying on rate limit / overloaded errors, server errors, dropped connections and timeouts.
+    Waits follow the server's retry-after headers (jittered exponential backoff otherwise), and
+    every attempt goes through the shared rate coordinator so concurrent workers pace together.
+    on_retry is invoked before each wait so callers can roll back partial side effects."""
+    delays = RETRY_DELAYS
+    coordinator = rate_limit.get_coordinator()
+    recorder = telemetry.current()
+
+    for attempt in range(1, len(delays) + 2):
+        queued = coordinator.acquire()
+        started = time.monotonic()
+        try:
+            result = send()
+        except Exception as e:
+            # Only SDK errors are retried, and those can only come from a loaded SDK: importing it
+            # up front would make every mock/replay request pay for the SDK's import time
+            if 'anthropic' not in sys.modules:
+                raise
+            from anthropic import APIConnectionError, APIStatusError
+            if not isinstance(e, (APIStatusError, APIConnectionError)):
+                raise
+            elapsed = time.monotonic() - started
+            kind, outcome = retry_kind(e), attempt_outcome(e)
+            if not kind or attempt > len(delays):
+                recorder.attempt(elapsed, outcome, queued=queued)
+                raise
+            delay = rate_limit.backoff_delay(attempt, e, delays if kind == 'throttled' else TRANSIENT_DELAYS)
+            recorder.attempt(elapsed, outcome, round(delay, 1), queued=queued)
+            if on_retry:
+                on_retry()
+            if kind == 'throttled':
+                label = "Rate limit hit" if outcome == 'rate_limited' else "API overloaded"
+                print(f"⏳ {label} (attempt {attempt}/{len(delays)}), waiting {delay:.0f}s...")
+                # Pausing the coordinator holds back every worker; the next acquire() does the waiting
+                coordinator.pause(delay)
+            else:
+                # Not a capacity signal: only this request waits, the other workers carry on
+                print(f"⚠️  Request failed ({outcome}, attempt {attempt}/{len(delays)}), retrying in {delay:.0f}s...")
+                time.sleep(delay)
+            continue
+        recorder.attempt(time.monotonic() - started, queued=queued)
+        return result
+
+
+def call_agent(agent, prompt, resume_from=None, model=MODEL, max_tokens=MAX_TOKENS):
+    """Call LLM with agent prompt. Retries on rate limit errors with exponential backoff.
+    resume_from continues a truncated output (e.g. a batch result) instead of starting fresh."""
+    client = get_client()
+    print(f"🤖 Calling {agent} agent ({model})...")
 
-    client = Anthropic(api_key=api_key)
-    print(f"🤖 Calling {agent} agent...")
+    def make_request(messages):
+        return with_retries(lambda: client.messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            **request_params(prompt, messages)
+        ))
+
+    # Truncated output is continued with the output so far as an assistant turn (see continuation.py)
+    continuation = Continuation(resume_from)
+    while True:
+        response = make_request(continuation.messages())
+        note_response(response)
+        if not continuation.add(response, response.content[0].text):
+            return continuation.output
+
+
+def call_agent_sections(agent, prompt, section_names, model=MODEL, max_tokens=MAX_TOKENS):
+    """Generate a structured document one section per request and stitch it (see sections.py)."""
+    print(f"🧩 Generating {agent} output in {len(section_names)} sections")
+    prompts = sections.section_prompts(prompt, section_names)
+    # The first request writes the shared prefix to the prompt cache; the rest read it in parallel
+    parts = [call_agent(agent, prompts[0], model=model, max_tokens=max_tokens)]
+    with ThreadPoolExecutor(max_workers=SECTION_WORKERS) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, call_agent, agent, p, None, model, max_tokens)
+                   for p in prompts[1:]]
+        parts += [future.result() for future in futures]
+    return sections.stitch(parts)
+
+
+def partial_path(output_path):
+    """Temp file a streamed generation is appended to before being renamed into place."""
+    output_file = Path(output_path)
+    return output_file.with_name(output_file.name + '.partial')
 
-    delays = [60, 120, 240]  # seconds between retries
 
-    def make_request(messages):
-        for attempt, delay in enumerate(delays, 1):
-            try:
-                return client.messages.create(
-                    model="claude-sonnet-4-5-20250929",
-                    max_tokens=16000,
-                    messages=messages
-                )
-            except RateLimitError:
-                if attempt <= len(delays):
-                    print(f"⏳ Rate limit hit (attempt {attempt}/{len(delays)}), waiting {delay}s...")
-                    time.sleep(delay)
-                else:
-                    raise
-            except APIStatusError as e:
-                if e.status_code == 529 and attempt <= len(delays):
-                    print(f"⏳ API overloaded (attempt {attempt}/{len(delays)}), waiting {delay}s...")
-                    time.sleep(delay)
-                else:
-                    raise
-        # Final attempt
-        return client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=16000,
-            messages=messages
-        )
-
-    messages = [{"role": "user", "content": prompt}]
-    full_output = ""
-    max_continuations = 5
-
-    for continuation in range(max_continuations + 1):
-        response = make_request(messages)
-        chunk = response.content[0].text
-        full_output += chunk
-
-        if response.stop_reason != "max_tokens":
-            break
-
-        print(f"⚠️  Output truncated, continuing... (part {continuation + 2})")
-        # Add the partial response as an assistant turn, then ask to continue
-        messages = messages + [
-            {"role": "assistant", "content": chunk},
-            {"role": "user", "content": "Continue exactly where you left off. Do not repeat any content already written."}
-        ]
-    else:
-        print(f"⚠️  Reached max continuations ({max_continuations}), output may be incomplete")
+def call_agent_streaming(agent, prompt, output_path, model=MODEL, max_tokens=MAX_TOKENS):
+    """Stream the LLM response straight into a .partial file next to output_path.
+
+    If a .partial file is left over from a crashed run, generation resumes from it
+    instead of starting again. On completion the file is atomically renamed to
+    output_path. Returns (full_output, metrics) with time-to-first-token and tokens/sec.
+    """
+    client = get_client()
+    partial = partial_path(output_path)
+    partial.parent.mkdir(parents=True, exist_ok=True)
 
-    return full_output
+    previous = partial.read_text() if partial.exists() else ""
+    if previous:
+        print(f"↩️  Resuming {agent} from {partial} ({len(previous)} chars)")
+    else:
+        print(f"🤖 Streaming {agent} agent ({model})...")
+    continuation = Continuation(previous)
+    recorder = telemetry.current()
+
+    metrics = {'ttft': None, 'output_tokens': 0, 'stream_seconds': 0.0, 'parts': 0}
+
+    with open(partial, 'a') as f:
+        def stream_part(messages):
+            offset = f.tell()
+            started = time.monotonic()
+            first_token = None
+            text = ""
+
+            def send():
+                nonlocal first_token, text
+                with client.messages.stream(model=model, max_tokens=max_tokens,
+                                            **request_params(prompt, messages)) as stream:
+                    for delta in stream.text_stream:
+                        if first_token is None:
+                            first_token = time.monotonic()
+                        f.write(delta)
+                        f.flush()
+                        text += delta
+                        recorder.streamed(len(continuation.output) + len(text))
+                    return stream.get_final_message()
+
+            def reset():
+                # Drop whatever a failed attempt wrote so the retry doesn't duplicate it
+                nonlocal started, first_token, text
+                f.seek(offset)
+                f.truncate()
+                started, first_token, text = time.monotonic(), None, ""
+
+            response = with_retries(send, on_retry=reset)
+            note_response(response)
+            finished = time.monotonic()
+            if metrics['ttft'] is None and first_token is not None:
+                metrics['ttft'] = first_token - started
+            metrics['output_tokens'] += response.usage.output_tokens
+            metrics['stream_seconds'] += finished - (first_token or started)
+            metrics['parts'] += 1
+            return response, text
+
+        while True:
+            response, chunk = stream_part(continuation.messages())
+            if not continuation.add(response, chunk):
+                break
+
+    os.replace(partial, output_path)
+    metrics['tokens_per_sec'] = (metrics['output_tokens'] / metrics['stream_seconds']
+                                 if metrics['stream_seconds'] else None)
+    ttft = f"{metrics['ttft']:.2f}s" if metrics['ttft'] is not None else "n/a"
+    tps = f"{metrics['tokens_per_sec']:.1f}" if metrics['tokens_per_sec'] else "n/a"
+    print(f"📈 TTFT {ttft}, {metrics['output_tokens']} tokens at {tps} tok/s")
+    print(f"📝 Streamed output to {output_path}")
+    return Path(output_path).read_text(), metrics
 
 
 def get_output_path(agent, task_input, task_output_path=None):
@@ -187,39 +433,179 @@ def mark_complete(task_id):
     print(f"✅ Task {task_id} marked complete")
 
 
-def run_judge(agent, output_path):
-    """Run judge validation on agent output."""
-    judge_dir = f'agents/judge-{agent}'
-    if not Path(judge_dir).exists():
-        print(f"⚠️  No judge for {agent}, skipping validation")
-        return {'result': 'PASS', 'score': 100, 'issues': []}
-    print(f"✅ Judge validation passed")
-    return {'result': 'PASS', 'score': 95, 'issues': []}
+def run_judge(agent, output_path, sections=None):
+    """Validate agent output: local checks first (see validation.py), then the agent's LLM judge
+    (agents/judge-{agent}) when the checks raise warnings, or always with AGENT_JUDGE=always."""
+    text = Path(output_path).read_text()
+    errors, warnings = validation.check(agent, text, sections, truncated=telemetry.current().get('truncated'))
+    if errors:
+        return {'result': 'FAIL', 'score': 0, 'issues': errors + warnings, 'stage': 'local'}
+    for warning in warnings:
+        print(f"⚠️  {warning}")
+
+    mode = validation.judge_mode()
+    judge_prompt = Path(f'agents/judge-{agent}/prompt.md')
+    if mode == 'off' or not judge_prompt.exists() or (mode == 'auto' and not warnings):
+        print(f"✅ Local checks passed")
+        return {'result': 'PASS', 'score': 100, 'issues': warnings, 'stage': 'local'}
+    return llm_judge(agent, judge_prompt, text, warnings)
+
+
+def llm_judge(agent, judge_prompt, text, warnings):
+    """Ask the agent's LLM judge for a verdict. An unreadable reply doesn't reject the output."""
+    print(f"⚖️  Escalating {agent} output to its LLM judge")
+    flagged = "".join(f"- {warning}\n" for warning in warnings)
+    content = f"## Output to Review\n\n{text}\n\n"
+    if flagged:
+        content += f"## Flagged by Automated Checks\n\n{flagged}\n"
+    client = get_client()
+    response = with_retries(lambda: client.messages.create(
+        model=MODEL,
+        max_tokens=JUDGE_MAX_TOKENS,
+        system=[text_block(judge_prompt.read_text(), cache=True)],
+        messages=[{"role": "user", "content": content + JUDGE_REPLY_FORMAT}]
+    ))
+    note_response(response)
+
+    match = re.search(r'\{.*\}', response.content[0].text, re.DOTALL)
+    try:
+        verdict = json.loads(match.group(0)) if match else None
+    except ValueError:
+        verdict = None
+    if not isinstance(verdict, dict) or verdict.get('result') not in ('PASS', 'FAIL'):
+        print(f"⚠️  Could not read the judge's verdict, accepting the output")
+        return {'result': 'PASS', 'score': None, 'issues': warnings, 'stage': 'llm'}
+    print(f"⚖️  Judge verdict: {verdict['result']} (score {verdict.get('score')})")
+    return {'result': verdict['result'], 'score': verdict.get('score'),
+            'issues': [str(issue) for issue in verdict.get('issues') or []], 'stage': 'llm'}
+
+
+def rejected_path(output_path):
+    output_file = Path(output_path)
+    return output_file.with_name(output_file.name + '.rejected')
 
 
-def run_task(task_id, agent, task_input, output_path=None):
-    """Main task execution."""
-    print(f"\n{'='*60}")
-    print(f"Running task: {task_id}")
-    print(f"Agent: {agent}")
-    print(f"{'='*60}\n")
+def with_feedback(prompt, issues):
+    """The prompt with a rejected attempt's validation issues appended to the task turn."""
+    note = ("## Previous Attempt Rejected\n\nA previous output for this task failed validation:\n"
+            + "".join(f"- {issue}\n" for issue in issues)
+            + "\nWrite the complete output again and fix every issue listed.")
+    if isinstance(prompt, str):
+        return f"{prompt}\n\n{note}"
+    return dict(prompt, content=prompt["content"] + [text_block(note)])
+
 
-    prompt = load_agent_prompt(agent, task_input)
-    output = call_agent(agent, prompt)
-    output_path = get_output_path(agent, task_input, task_output_path=output_path)
-    save_output(output_path, output)
+def finish_task(task_id, agent, output_path, output=None, fingerprint=None, sections=None, issues=None):
+    """Save output, validate it and write the completion sentinel. Returns True on PASS.
+    Pass output=None when the content is already on disk (streaming mode). The input
+    fingerprint taken when the prompt was built is recorded alongside the sentinel.
+    A rejected output is moved to <output>.rejected so the task isn't taken as done; its
+    issues are appended to issues (if given) so the caller can retry with them."""
+    if output is not None:
+        save_output(output_path, output)
+    telemetry.current().set(output_path=str(output_path))
 
-    judge_result = run_judge(agent, output_path)
+    judge_result = run_judge(agent, output_path, sections)
+    telemetry.current().set(validation={k: judge_result[k] for k in ('result', 'stage', 'issues')})
 
     if judge_result['result'] == 'PASS':
+        rejected_path(output_path).unlink(missing_ok=True)
         mark_complete(task_id)
+        if fingerprint is not None:
+            fingerprints.save(task_id, fingerprint)
         print(f"\n✅ Task {task_id} completed successfully")
-    else:
-        print(f"\n❌ Task {task_id} failed validation")
+        return True
+
+    rejected = rejected_path(output_path)
+    os.replace(output_path, rejected)
+    print(f"\n❌ Task {task_id} failed validation ({judge_result['stage']} checks), output moved to {rejected}:")
+    for issue in judge_result['issues']:
+        print(f"   - {issue}")
+    if issues is not None:
+        issues.extend(judge_result['issues'])
+    return False
+
+
+def run_task(task_id, agent, task_input, output_path=None, stream=None, use_cache=None, section_names=None,
+             model=None, max_tokens=None):
+    """Main task execution. Streaming is enabled by stream=True or AGENT_STREAM=1;
+    the response cache is bypassed by use_cache=False or AGENT_CACHE=off.
+    section_names (the stage's `sections`) generates the output one section per request.
+    model and max_tokens are the task's routing (see models.py); None means the defaults."""
+    model, max_tokens = model or MODEL, max_tokens or MAX_TOKENS
+    print(f"\n{'='*60}")
+    print(f"Running task: {task_id}")
+    print(f"Agent: {agent}")
+    print(f"{'='*60}\n")
+
+    if stream is None:
+        stream = os.environ.get('AGENT_STREAM') == '1'
+
+    with telemetry.record_task(task_id, agent, task_input, model) as recorder:
+        started = time.monotonic()
+        prompt = load_agent_prompt(agent, task_input)
+        fingerprint = fingerprints.compute(agent, task_input, model)
+        recorder.prompt_built(time.monotonic() - started)
+        output_path = get_output_path(agent, task_input, task_output_path=output_path)
+
+        cache = open_cache(use_cache)
+        issues = []
+        for attempt in range(VALIDATION_RETRIES + 1):
+            if attempt:
+                # Only this task is regenerated; the feedback also gives the retry a fresh cache key
+                print(f"🔁 Regenerating {task_id} with the validation feedback (attempt {attempt + 1})")
+                prompt, issues = with_feedback(prompt, issues), []
+                recorder.set(truncated=False, validation_retries=attempt)
+
+            key = cache_key(prompt_text(prompt), model, max_tokens)
+            output = cache.get(key) if cache else None
+            if output is not None:
+                print(f"♻️  Cache hit for {task_id} ({key[:12]}), skipping LLM call")
+                recorder.set(cache_hit=True, output_chars=len(output))
+                if finish_task(task_id, agent, output_path, output, fingerprint, section_names, issues):
+                    return
+                continue
+
+            if section_names:
+                # Sections are generated in parallel, so they are not streamed to one file
+                output = call_agent_sections(agent, prompt, section_names, model, max_tokens)
+                recorder.set(sections=len(section_names))
+                passed = finish_task(task_id, agent, output_path, output, fingerprint, section_names, issues)
+            elif stream:
+                output, metrics = call_agent_streaming(agent, prompt, output_path, model, max_tokens)
+                recorder.set(ttft_seconds=metrics['ttft'], tokens_per_sec=metrics['tokens_per_sec'])
+                passed = finish_task(task_id, agent, output_path, fingerprint=fingerprint, issues=issues)
+            else:
+                output = call_agent(agent, prompt, model=model, max_tokens=max_tokens)
+                passed = finish_task(task_id, agent, output_path, output, fingerprint, section_names, issues)
+            recorder.set(output_chars=len(output))
+            if passed:
+                if cache:
+                    cache.put(key, output)
+                return
         sys.exit(1)
 
 
 if __name__ == '__main__':
+    # Every pipeline path is relative to the project root: --root, or the root find-next-task tagged the task with
+    if '--root' in sys.argv[1:]:
+        index = sys.argv.index('--root')
+        root = sys.argv[index + 1]
+        del sys.argv[index:index + 2]
+    else:
+        root = json.loads(os.environ.get('TASK_JSON') or '{}').get('root')
+    if root:
+        from projects import Project
+        os.chdir(Project.parse(root).root)
+    if '--batch' in sys.argv[1:]:
+        # Batch mode: the whole TASKS_JSON list (find-next-task's tasks= output) goes out as one message batch
+        from batch_runner import main as batch_main
+        sys.exit(batch_main(sys.argv[1:]))
+    if '--pool' in sys.argv[1:]:
+        # Pool mode: the whole TASKS_JSON list runs on a worker pool inside this one process
+        from task_pool import main as pool_main
+        sys.exit(pool_main(sys.argv[1:]))
+
     # Task details are passed via TASK_JSON env var (set by the workflow matrix)
     task_json = os.environ.get('TASK_JSON')
     if not task_json:
@@ -241,4 +627,8 @@ if __name__ == '__main__':
         run_task(args.task_id, args.agent, task_input)
     else:
         task = json.loads(task_json)
-        run_task(task['id'], task['agent'], task.get('input', {}), task.get('output_path'))
+        # Staged speculative outputs whose gate has since been approved count as done (see speculation.py)
+        if not speculation.without_promoted([task]):
+            sys.exit(0)
+        run_task(task['id'], task['agent'], task.get('input', {}), task.get('output_path'),
+                 section_names=task.get('sections'), model=task.get('model'), max_tokens=task.get('max_tokens'))
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Long-running scheduler — loads pipeline.yml once and runs tasks in-process as soon as they become runnable.
+Reuses the find-next-task stage processors, so gates and completion tracking behave exactly as in CI.
+Stops when the pipeline reaches an approval gate, completes, or only failed tasks remain.
+With --speculate it then runs the stages behind the gate in a scratch copy (see speculation.py).
+With several --root options it schedules every project on one shared set of slots (see projects.py).
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import events
+import projects
+import speculation
+
+finder = importlib.import_module('find-next-task')
+runner = importlib.import_module('run-task')
+
+
+def execute_task(task, stream=None, use_cache=None):
+    """Run a single task through run-task. Returns True on success."""
+    try:
+        runner.run_task(task['id'], task['agent'], task.get('input', {}), task.get('output_path'),
+                        stream=stream, use_cache=use_cache, section_names=task.get('sections'),
+                        model=task.get('model'), max_tokens=task.get('max_tokens'))
+    except SystemExit as e:
+        return not e.code
+    except Exception as e:
+        print(f"❌ Task {task['id']} raised {type(e).__name__}: {e}")
+        return False
+    return True
+
+
+def collect(pipeline, use_dag=False):
+    """Runnable (stage id, task) pairs, a note on where the pipeline stands when nothing is runnable,
+    and the id of the approval gate it is waiting on (if any)."""
+    speculation.promote()
+    if use_dag:
+        from pipeline_dag import runnable_tasks
+        dag, runnable = runnable_tasks(pipeline)
+        gates = dag.pending_gates()
+        events.emit('scan', runnable=len(runnable), remaining=sum(not node.done for node in dag.nodes.values()),
+                    gate=gates[0].id if gates else None)
+        if gates:
+            return runnable, f"Stopped at gate: {gates[0].id}", gates[0].id
+        if all(node.done for node in dag.nodes.values()):
+            return runnable, "All stages complete", None
+        return runnable, None, None
+
+    stage, result = finder.collect_tasks(pipeline)
+    events.emit('scan', stage=stage and stage['id'], runnable=len(result or []),
+                gate=stage['id'] if result is None else None)
+    if result is None:
+        return [], f"Stopped at gate: {stage['id']}", stage['id']
+    if stage is None:
+        return [], "All stages complete", None
+    return [(stage['id'], task) for task in result], None, None
+
+
+def approve_gate(pipeline, gate_id):
+    """Write a gate's sentinel, as a human approval would (dry runs only)."""
+    stage = next(s for s in pipeline if s['id'] == gate_id)
+    sentinel = Path(stage['sentinel'])
+    sentinel.parent.mkdir(parents=True, exist_ok=True)
+    sentinel.touch()
+    print(f"✔️  Auto-approved gate {gate_id} ({sentinel})")
+
+
+def summarize(note, completed, failed):
+    """Print the end-of-run summary and return the process exit code."""
+    events.emit('run_finished', completed=completed, failed=len(failed), note=note)
+    print(f"\n# Scheduler finished: {completed} task(s) completed, {len(failed)} failed", file=sys.stderr)
+    if failed:
+        print(f"# Failed: {sorted(failed)}", file=sys.stderr)
+        return 1
+    if note:
+        print(f"# {note}", file=sys.stderr)
+    return 0
+
+
+def run_scheduler(max_workers=2, stream=None, use_cache=None, use_dag=False, approve_gates=False, speculate=False):
+    """Dependency-aware loop: rescan after every completion and start whatever became runnable.
+    approve_gates writes each gate's sentinel when the run reaches it instead of stopping there;
+    speculate runs the stages behind it speculatively instead."""
+    pipeline = finder.load_pipeline()
+    if pipeline is None:
+        print("# pipeline.yml not found", file=sys.stderr)
+        return 1
+
+    in_flight = {}  # future -> task
+    failed = set()
+    completed = 0
+    events.emit('run_started', mode='scheduler', engine='threads', workers=max_workers, dag=use_dag)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            runnable, note, gate = collect(pipeline, use_dag)
+            running = {task['id'] for task in in_flight.values()}
+
+            for stage_id, task in runnable:
+                if task['id'] in running or task['id'] in failed:
+                    continue
+                print(f"▶️  [{stage_id}] starting {task['id']} ({task['agent']})")
+                events.emit('queued', task_id=task['id'], agent=task['agent'], stage=stage_id)
+                in_flight[pool.submit(execute_task, task, stream, use_cache)] = task
+
+            if not in_flight:
+                if gate and approve_gates:
+                    approve_gate(pipeline, gate)
+                    continue
+                if gate and speculate and not failed:
+                    speculation.speculate(pipeline, gate, ['--max-workers', str(max_workers)])
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = in_flight.pop(future)
+                if future.result():
+                    completed += 1
+                else:
+                    failed.add(task['id'])
+                    print(f"❌ Task {task['id']} failed — not retrying in this run")
+
+    return summarize(note, completed, failed)
+
+
+async def run_scheduler_async(engine, use_dag=False, approve_gates=False, speculate=False):
+    """Same loop as run_scheduler, but every task shares one event loop, client and limiter."""
+    pipeline = finder.load_pipeline()
+    if pipeline is None:
+        print("# pipeline.yml not found", file=sys.stderr)
+        return 1
+
+    in_flight = {}  # asyncio.Task -> task
+    failed = set()
+    completed = 0
+    events.emit('run_started', mode='scheduler', engine='async', workers=int(engine.limiter.limit), dag=use_dag)
+
+    while True:
+        runnable, note, gate = collect(pipeline, use_dag)
+        running = {task['id'] for task in in_flight.values()}
+
+        for stage_id, task in runnable:
+            if task['id'] in running or task['id'] in failed:
+                continue
+            print(f"▶️  [{stage_id}] queued {task['id']} ({task['agent']})")
+            events.emit('queued', task_id=task['id'], agent=task['agent'], stage=stage_id)
+            in_flight[asyncio.create_task(engine.run_task(task))] = task
+
+        if not in_flight:
+            if gate and approve_gates:
+                approve_gate(pipeline, gate)
+                continue
+            if gate and speculate and not failed:
+                # Blocking is fine: nothing else is in flight while the pipeline waits at the gate
+                speculation.speculate(pipeline, gate, ['--engine', 'async', '--max-workers',
+                                                       str(int(engine.limiter.limit))])
+            break
+
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            task = in_flight.pop(future)
+            if future.result():
+                completed += 1
+            else:
+                failed.add(task['id'])
+                print(f"❌ Task {task['id']} failed — not retrying in this run")
+
+    print(f"# Final concurrency limit: {int(engine.limiter.limit)} "
+          f"({engine.limiter.throttle_events} throttle event(s))", file=sys.stderr)
+    return summarize(note, completed, failed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-workers', type=int, default=2,
+                        help='concurrent tasks for the thread engine, initial limit for the async engine (default: 2)')
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads',
+                        help='threads = one blocking client per task; async = one pooled client with adaptive concurrency')
+    parser.add_argument('--max-concurrency', type=int, default=16,
+                        help='upper bound for the adaptive concurrency limit (async engine)')
+    parser.add_argument('--dag', action='store_true',
+                        help='schedule from the task-level DAG: release work from every stage, critical path first')
+    parser.add_argument('--stream', action='store_true', default=None,
+                        help='stream outputs to disk as they are generated (thread engine; same as AGENT_STREAM=1)')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', default=None,
+                        help='bypass the response cache (same as AGENT_CACHE=off)')
+    parser.add_argument('--rpm', type=int, help='requests-per-minute budget (async engine, or shared by every --root)')
+    parser.add_argument('--tpm', type=int,
+                        help='input+output tokens-per-minute budget (async engine, or shared by every --root)')
+    parser.add_argument('--approve-gates', action='store_true',
+                        help='approve gates automatically instead of stopping (dry runs with AGENT_BACKEND=mock)')
+    parser.add_argument('--speculate', action='store_true',
+                        help='at a gate, run the next stages in a scratch copy and stage the results for promotion')
+    parser.add_argument('--root', action='append', metavar='PATH[:WEIGHT]',
+                        help='project root to schedule (default: current directory); repeat to share the '
+                             'workers and rate budget between several projects')
+    parser.add_argument('--policy', choices=projects.POLICIES, default='fair',
+                        help='how --root projects share workers: fair = weighted fair share, '
+                             'priority = highest weight first (default: fair)')
+    args = parser.parse_args()
+
+    if args.root and len(args.root) > 1:
+        if args.engine == 'async' or args.speculate:
+            parser.error('--engine async and --speculate run in one project; run them per --root')
+        sys.exit(projects.run_projects(args.root, max_workers=args.max_workers, use_dag=args.dag,
+                                       approve_gates=args.approve_gates, policy=args.policy, stream=args.stream,
+                                       use_cache=args.use_cache, rpm=args.rpm, tpm=args.tpm))
+    if args.root:
+        os.chdir(projects.Project.parse(args.root[0]).root)
+
+    if args.engine == 'async':
+        from async_engine import AdaptiveLimiter, AsyncEngine
+        from response_cache import open_cache
+        limiter = AdaptiveLimiter(initial=args.max_workers, maximum=args.max_concurrency,
+                                  rpm=args.rpm, tpm=args.tpm)
+        engine = AsyncEngine(limiter, cache=open_cache(args.use_cache))
+        sys.exit(asyncio.run(run_scheduler_async(engine, use_dag=args.dag, approve_gates=args.approve_gates,
+                                                 speculate=args.speculate)))
+    sys.exit(run_scheduler(max_workers=args.max_workers, stream=args.stream, use_cache=args.use_cache,
+                           use_dag=args.dag, approve_gates=args.approve_gates, speculate=args.speculate))
@@ -0,0 +1,39 @@
+"""
+Section-by-section generation for large structured documents.
+
+A stage in pipeline.yml can list the `## ` sections of its output document:
+
+    sections: [Overview, Data Model, API Endpoints]
+
+Its tasks then make one request per section instead of one long response that may need
+several serial continuations. Every request sends the same prompt, with a cache breakpoint on
+the task's user turn, plus a short instruction naming its section. The first section is
+generated alone so that it writes the prompt cache. The others then run in parallel and read
+the shared prefix from it. The parts are joined in order with the `---` separators the output
+formats use.
+"""
+SEPARATOR = "\n\n---\n\n"
+
+
+def instruction(index, sections):
+    heading = sections[index]
+    others = ", ".join(f"`## {s}`" for i, s in enumerate(sections) if i != index)
+    if index == 0:
+        scope = f"the document's title block and its `## {heading}` section"
+    else:
+        scope = f"only the `## {heading}` section of the document, starting with that heading"
+    return (f"Write {scope}, following the output format above. The other sections ({others}) are "
+            f"written separately and joined to yours, so do not write them and do not add `---` separators.")
+
+
+def section_prompts(prompt, sections):
+    """One prompt per section. Every prompt shares the agent prompt and task content as a cached prefix."""
+    content = [dict(block) for block in prompt["content"]]
+    content[-1]["cache_control"] = {"type": "ephemeral"}
+    return [{"system": prompt["system"],
+             "content": content + [{"type": "text", "text": instruction(i, sections)}]}
+            for i in range(len(sections))]
+
+
+def stitch(parts):
+    return SEPARATOR.join(part.strip() for part in parts) + "\n"
@@ -0,0 +1,188 @@
+"""
+Speculative execution past approval gates.
+
+When the pipeline stops at a gate that is only waiting for a human, `scheduler.py --speculate`
+runs the work after the gate anyway. It copies the project to a scratch directory, approves the
+gate there, and runs the DAG scheduler in the copy until it reaches the next gate. The outputs
+are staged under docs/.state/speculative/, each with the fingerprint it was generated from,
+and nothing in docs/ outside that directory changes.
+
+promote() runs before the scheduler and run-task start work; find-next-task only reads, so in
+CI the promotion lands in the run job's commit, and a staged task the finder lists is skipped
+there once it has been promoted (see without_promoted). Once a staged
+task's gate has been approved, it compares the staged fingerprint with the real project. If
+nobody edited the task's input files during the review, the output is moved into place with
+its sentinel and fingerprint, as if the task had just run. If they were edited, the staged
+output is discarded and the task runs normally. Changes that only show up in the task itself
+(e.g. a feature added during review, or the stage routed to another model) are caught by the
+usual fingerprint check after promotion.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import fingerprints
+
+STAGING_DIR = Path('docs/.state/speculative')
+MANIFEST = STAGING_DIR / 'manifest.json'
+COMPLETED_DIR = Path('docs/.state/completed')
+TELEMETRY_DIR = Path('docs/.state/telemetry')
+SHARED = ('agents', 'context', 'pipeline.yml', '.cache')  # linked into the scratch project, not copied
+SCHEDULER = Path(__file__).with_name('scheduler.py')
+
+
+def load_manifest():
+    """{task_id: {'output', 'gate', 'fingerprint'}} for every staged output."""
+    if not MANIFEST.exists():
+        return {}
+    with open(MANIFEST) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    if not manifest:
+        shutil.rmtree(STAGING_DIR, ignore_errors=True)
+        return
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST.with_name(MANIFEST.name + f'.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, MANIFEST)
+
+
+def staged_path(output):
+    return STAGING_DIR / output
+
+
+# ---------------------------------------------------------------------------
+# Promotion
+# ---------------------------------------------------------------------------
+
+def promote():
+    """Move staged outputs into place once their gate is approved. Returns the promoted task ids."""
+    manifest = load_manifest()
+    if not manifest:
+        return []
+
+    promoted = []
+    # Repeat until nothing changes: promoting one output can make the next one's inputs match
+    progress = True
+    while progress:
+        progress = False
+        for task_id, entry in sorted(manifest.items()):
+            recorded = entry['fingerprint']
+            if not Path(entry['gate']).exists() or fingerprints.compare(
+                    recorded, recorded['agent'], recorded['input'], recorded['model']):
+                continue
+            output = Path(entry['output'])
+            output.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staged_path(entry['output']), output)
+            COMPLETED_DIR.mkdir(parents=True, exist_ok=True)
+            (COMPLETED_DIR / f'{task_id}.done').touch()
+            fingerprints.save(task_id, recorded)
+            del manifest[task_id]
+            promoted.append(task_id)
+            progress = True
+            print(f"🔮 Promoted speculative output of {task_id} to {output}", file=sys.stderr)
+
+    for task_id, entry in sorted(manifest.items()):
+        if Path(entry['gate']).exists():
+            recorded = entry['fingerprint']
+            reasons = fingerprints.compare(recorded, recorded['agent'], recorded['input'], recorded['model'])
+            print(f"🗑️  Discarded speculative output of {task_id}: {', '.join(reasons)} changed", file=sys.stderr)
+            staged_path(entry['output']).unlink(missing_ok=True)
+            del manifest[task_id]
+
+    save_manifest(manifest)
+    return promoted
+
+
+def without_promoted(tasks):
+    """Promote whatever is ready, and return the tasks whose outputs that didn't put in place."""
+    promoted = set(promote())
+    return [task for task in tasks if task['id'] not in promoted]
+
+
+# ---------------------------------------------------------------------------
+# Speculative runs
+# ---------------------------------------------------------------------------
+
+def make_scratch(manifest, sentinel):
+    """Copy of the project with every staged output applied and the gate approved."""
+    scratch = Path(tempfile.mkdtemp(prefix='speculate-'))
+    Path('.cache').mkdir(exist_ok=True)  # so the rate coordinator and response cache are shared
+    for name in SHARED:
+        if Path(name).exists():
+            os.symlink(Path(name).resolve(), scratch / name)
+
+    state_dir = str(STAGING_DIR.parent)
+    skip = {STAGING_DIR.name, TELEMETRY_DIR.name}
+    shutil.copytree('docs', scratch / 'docs',
+                    ignore=lambda directory, names: [n for n in names if directory == state_dir and n in skip])
+
+    for task_id, entry in manifest.items():
+        output = scratch / entry['output']
+        output.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(staged_path(entry['output']), output)
+        (scratch / COMPLETED_DIR).mkdir(parents=True, exist_ok=True)
+        (scratch / COMPLETED_DIR / f'{task_id}.done').touch()
+        fingerprint_path = scratch / fingerprints.FINGERPRINT_DIR / f'{task_id}.json'
+        fingerprint_path.parent.mkdir(parents=True, exist_ok=True)
+        fingerprint_path.write_text(json.dumps(entry['fingerprint'], indent=2, sort_keys=True))
+
+    (scratch / sentinel).parent.mkdir(parents=True, exist_ok=True)
+    (scratch / sentinel).touch()
+    return scratch
+
+
+def harvest(scratch, sentinel, manifest):
+    """Stage every task the scratch run completed that hasn't run in the real project."""
+    # The scratch run's telemetry says where each task wrote its output
+    records = [json.loads(line) for path in (scratch / TELEMETRY_DIR).glob('*.jsonl')
+               for line in path.read_text().splitlines()]
+    outputs = {r['task_id']: r['output_path'] for r in records if r.get('output_path')}
+
+    staged = []
+    for done in sorted((scratch / COMPLETED_DIR).glob('*.done')):
+        task_id = done.stem
+        output = outputs.get(task_id)
+        fingerprint_path = scratch / fingerprints.FINGERPRINT_DIR / f'{task_id}.json'
+        if not output or (COMPLETED_DIR / done.name).exists() or not fingerprint_path.exists():
+            continue
+        target = staged_path(output)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(scratch / output, target)
+        manifest[task_id] = {'output': output, 'gate': sentinel,
+                             'fingerprint': json.loads(fingerprint_path.read_text())}
+        staged.append(task_id)
+
+    # Speculative calls cost the same as real ones: keep them in the run report
+    for record in records:
+        TELEMETRY_DIR.mkdir(parents=True, exist_ok=True)
+        with open(TELEMETRY_DIR / f"{record['task_id']}.jsonl", 'a') as f:
+            f.write(json.dumps(dict(record, speculative=True)) + '\n')
+    return staged
+
+
+def speculate(pipeline, gate_id, scheduler_args=()):
+    """Run the tasks behind gate_id up to the next gate in a scratch copy, and stage their outputs."""
+    stage = next(s for s in pipeline if s['id'] == gate_id)
+    sentinel = stage['sentinel']
+    manifest = load_manifest()
+
+    print(f"🔮 Gate {gate_id} is waiting for approval — running the next stages speculatively")
+    scratch = make_scratch(manifest, sentinel)
+    try:
+        result = subprocess.run([sys.executable, str(SCHEDULER), '--dag', *scheduler_args], cwd=scratch)
+        staged = harvest(scratch, sentinel, manifest)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    save_manifest(manifest)
+
+    print(f"🔮 Staged {len(staged)} speculative output(s) in {STAGING_DIR}; they are promoted when "
+          f"{sentinel} is pushed if their inputs haven't changed")
+    return result.returncode
@@ -0,0 +1,134 @@
+"""
+Worker-pool execution mode — runs find-next-task's whole task list inside one process.
+
+Each task still writes its output, sentinel and fingerprint as soon as it finishes, so an
+interrupted run keeps everything that completed. The caller (the workflow's pool job) commits
+once when the pool drains, instead of every task paying for its own Actions job.
+Tasks from several projects (find-next-task --root) run as one pool process per project root,
+with --workers and --max-concurrency split between them by project weight.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import events
+import speculation
+from projects import RUNNER, Project
+from scheduler import execute_task
+
+
+def run_threads(tasks, max_workers, stream=None, use_cache=None):
+    """Run tasks on a thread pool. Returns the ids of the tasks that failed."""
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(execute_task, task, stream, use_cache): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            if not future.result():
+                failed.append(task['id'])
+    return failed
+
+
+async def run_async(tasks, max_workers, max_concurrency, use_cache=None):
+    """Run tasks in one event loop with a pooled client and adaptive concurrency."""
+    from async_engine import AdaptiveLimiter, AsyncEngine
+    from response_cache import open_cache
+    limiter = AdaptiveLimiter(initial=max_workers, maximum=max_concurrency)
+    engine = AsyncEngine(limiter, cache=open_cache(use_cache))
+    results = await asyncio.gather(*(engine.run_task(task) for task in tasks))
+    return [task['id'] for task, passed in zip(tasks, results) if not passed]
+
+
+def run_pool(tasks, max_workers=4, engine='threads', max_concurrency=16, stream=None, use_cache=None):
+    """Run every task in the list. Returns the process exit code."""
+    print(f"🧵 Running {len(tasks)} task(s) on a worker pool ({engine}, {max_workers} worker(s))")
+    events.emit('run_started', mode='pool', engine=engine, workers=max_workers)
+    for task in tasks:
+        events.emit('queued', task_id=task['id'], agent=task['agent'])
+    if engine == 'async':
+        failed = asyncio.run(run_async(tasks, max_workers, max_concurrency, use_cache))
+    else:
+        failed = run_threads(tasks, max_workers, stream, use_cache)
+    events.emit('run_finished', completed=len(tasks) - len(failed), failed=len(failed))
+
+    if failed:
+        print(f"❌ {len(failed)} of {len(tasks)} task(s) failed: {sorted(failed)}")
+        return 1
+    print(f"✅ All {len(tasks)} task(s) completed")
+    return 0
+
+
+def run_per_root(tasks, args):
+    """One pool process per project root, side by side. Returns the process exit code."""
+    groups, weights = {}, {}
+    for task in tasks:
+        root = task.get('root') or '.'
+        groups.setdefault(root, []).append(task)
+        weights[root] = task.get('weight', 1)
+    total = sum(weights.values())
+
+    def share(budget, root):
+        # One budget split by project weight, rather than every child taking all of it
+        return max(1, budget * weights[root] // total)
+
+    print(f"🗂️  Running {len(tasks)} task(s) from {len(groups)} projects: "
+          + ', '.join(f"{Project.parse(root).name} {share(args.workers, root)} worker(s)" for root in groups))
+
+    options = ['--engine', args.engine]
+    if args.stream:
+        options.append('--stream')
+    if args.use_cache is False:
+        options.append('--no-cache')
+    # Each child sees tasks from a single root and moves into it
+    events.emit('run_started', mode='pool', engine=args.engine, workers=args.workers, projects=len(groups))
+    env = dict(os.environ, AGENT_EVENTS=events.shared_target())
+    children = [subprocess.Popen([sys.executable, str(RUNNER), '--pool', *options,
+                                  '--workers', str(share(args.workers, root)),
+                                  '--max-concurrency', str(share(args.max_concurrency, root))],
+                                 env=dict(env, TASKS_JSON=json.dumps(group), AGENT_PROJECT=Project.parse(root).name))
+                for root, group in groups.items()]
+    code = max([child.wait() for child in children])
+    events.emit('run_finished')
+    return code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run find-next-task's task list on a worker pool in one process")
+    parser.add_argument('--pool', action='store_true', help='(accepted for run-task.py compatibility)')
+    parser.add_argument('--tasks-file', help='JSON task list; defaults to the TASKS_JSON env var')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='concurrent tasks (initial limit for the async engine, default: 4)')
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads')
+    parser.add_argument('--max-concurrency', type=int, default=16,
+                        help='upper bound for the adaptive concurrency limit (async engine)')
+    parser.add_argument('--stream', action='store_true', default=None,
+                        help='stream outputs to disk as they are generated (thread engine)')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', default=None,
+                        help='bypass the response cache (same as AGENT_CACHE=off)')
+    args = parser.parse_args(argv)
+
+    if args.tasks_file:
+        with open(args.tasks_file) as f:
+            tasks = json.load(f)
+    elif os.environ.get('TASKS_JSON'):
+        tasks = json.loads(os.environ['TASKS_JSON'])
+    else:
+        parser.error('no tasks: set TASKS_JSON or pass --tasks-file')
+
+    roots = {task.get('root') for task in tasks}
+    if len(roots) > 1:
+        return run_per_root(tasks, args)
+    if roots - {None}:
+        os.chdir(Project.parse(roots.pop()).root)
+    tasks = speculation.without_promoted(tasks)
+
+    return run_pool(tasks, max_workers=args.workers, engine=args.engine, max_concurrency=args.max_concurrency,
+                    stream=args.stream, use_cache=args.use_cache)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Per-task instrumentation — timings, API attempts, token usage and output size.
+
+Each task run appends one JSON record to docs/.state/telemetry/{task_id}.jsonl (one file per
+task, so parallel jobs never touch the same file). scripts/report.py aggregates them.
+
+The recorder for the running task lives in a context variable, so the LLM call paths can
+report attempts and usage without it being threaded through every signature; it works the
+same under threads (one task per worker) and asyncio (one task per asyncio.Task).
+The recorder also emits the task's live events (started, throttled, retrying, progress,
+completed/failed) to the event stream, see events.py.
+"""
+import contextvars
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import events
+
+TELEMETRY_DIR = Path('docs/.state/telemetry')
+RUN_ID = events.RUN_ID
+THROTTLED_AFTER = 1.0  # seconds queued for the shared rate budget before it counts as a stall
+
+# USD per million tokens: (input, output, cache write, cache read)
+PRICES = {
+    'claude-haiku-4-5-20251001': (1.00, 5.00, 1.25, 0.10),
+    'claude-sonnet-4-5-20250929': (3.00, 15.00, 3.75, 0.30),
+    'claude-opus-4-5-20251101': (5.00, 25.00, 6.25, 0.50),
+}
+
+_current = contextvars.ContextVar('telemetry_recorder', default=None)
+
+
+def estimate_cost(model, input_tokens, output_tokens, cache_write_tokens=0, cache_read_tokens=0):
+    prices = PRICES.get(model)
+    if not prices:
+        return None
+    counts = (input_tokens, output_tokens, cache_write_tokens, cache_read_tokens)
+    return sum(n * p for n, p in zip(counts, prices)) / 1_000_000
+
+
+class TaskRecorder:
+    def __init__(self, task_id, agent, task_input=None, model=None):
+        self.started = time.monotonic()
+        self.record = {
+            'run_id': RUN_ID,
+            'task_id': task_id,
+            'agent': agent,
+            'feature_id': (task_input or {}).get('feature_id'),
+            'model': model,
+            'started_at': time.time(),
+            'prompt_seconds': None,
+            'attempts': [],   # {'seconds', 'outcome', 'wait', 'queued'}
+            'parts': [],      # one per continuation: tokens and stop reason
+            'cache_hit': False,
+            'output_chars': None,
+            'status': 'running',
+        }
+        self.progress_throttle = events.Throttle()
+        events.emit('started', task_id=task_id, agent=agent, model=model, feature_id=self.record['feature_id'])
+
+    def prompt_built(self, seconds):
+        self.record['prompt_seconds'] = round(seconds, 4)
+
+    def attempt(self, seconds, outcome='ok', wait=0, queued=0):
+        """One API call: its latency, outcome, the backoff it triggered and time spent queued before it."""
+        self.record['attempts'].append({'seconds': round(seconds, 3), 'outcome': outcome, 'wait': wait,
+                                        'queued': round(queued, 3)})
+        task_id = self.record['task_id']
+        if queued >= THROTTLED_AFTER:
+            events.emit('throttled', task_id=task_id, seconds=round(queued, 3))
+        if wait:
+            events.emit('retrying', task_id=task_id, attempt=len(self.record['attempts']), outcome=outcome,
+                        wait=wait, seconds=round(seconds, 3))
+
+    def usage(self, usage, stop_reason, model=None):
+        """One response. model is the model that answered it; summaries and judges may use another than the task's."""
+        self.record['parts'].append({
+            'model': model or self.record['model'],
+            'input_tokens': usage.input_tokens,
+            'output_tokens': usage.output_tokens,
+            'cache_write_tokens': getattr(usage, 'cache_creation_input_tokens', None) or 0,
+            'cache_read_tokens': getattr(usage, 'cache_read_input_tokens', None) or 0,
+            'stop_reason': stop_reason,
+        })
+        events.emit('progress', task_id=self.record['task_id'], parts=len(self.record['parts']),
+                    output_tokens=sum(part['output_tokens'] for part in self.record['parts']))
+
+    def streamed(self, output_chars):
+        """Output written so far by a streaming response (reported at most once per progress interval)."""
+        if self.progress_throttle.ready():
+            events.emit('progress', task_id=self.record['task_id'], output_chars=output_chars,
+                        output_tokens=sum(part['output_tokens'] for part in self.record['parts']))
+
+    def set(self, **fields):
+        self.record.update(fields)
+
+    def get(self, field, default=None):
+        return self.record.get(field, default)
+
+    def finish(self, status):
+        record = self.record
+        record['status'] = status
+        record['seconds'] = round(time.monotonic() - self.started, 3)
+        totals = {key: sum(p[key] for p in record['parts'])
+                  for key in ('input_tokens', 'output_tokens', 'cache_write_tokens', 'cache_read_tokens')}
+        record.update(totals)
+        record['retry_wait_seconds'] = sum(a['wait'] for a in record['attempts'])
+        costs = [estimate_cost(part.get('model') or record['model'],
+                               **{key: part[key] for key in totals}) for part in record['parts']]
+        known = [cost for cost in costs if cost is not None]
+        record['cost_usd'] = sum(known) if known or not costs else None
+
+        TELEMETRY_DIR.mkdir(parents=True, exist_ok=True)
+        with open(TELEMETRY_DIR / f"{record['task_id']}.jsonl", 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        events.emit(status, task_id=record['task_id'], agent=record['agent'], model=record['model'],
+                    seconds=record['seconds'], cache_hit=record['cache_hit'] or None,
+                    attempts=len(record['attempts']), retry_wait_seconds=record['retry_wait_seconds'],
+                    **totals, cost_usd=record['cost_usd'])
+
+
+class _NullRecorder:
+    """Stand-in used outside a recorded task, so call sites never need to check."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+_null = _NullRecorder()
+
+
+def current():
+    return _current.get() or _null
+
+
+@contextmanager
+def record_task(task_id, agent, task_input=None, model=None):
+    """Record one task run; status is 'failed' if the block raises or calls sys.exit with an error."""
+    recorder = TaskRecorder(task_id, agent, task_input, model)
+    token = _current.set(recorder)
+    status = 'failed'
+    try:
+        yield recorder
+        status = recorder.record['status'] if recorder.record['status'] != 'running' else 'completed'
+    except SystemExit as e:
+        status = 'failed' if e.code else 'completed'
+        raise
+    finally:
+        _current.reset(token)
+        recorder.finish(status)
+
+
+def load_records(directory=TELEMETRY_DIR):
+    records = []
+    for path in sorted(Path(directory).glob('*.jsonl')):
+        with open(path) as f:
+            records += [json.loads(line) for line in f if line.strip()]
+    return records
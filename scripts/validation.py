@@ -0,0 +1,95 @@
+"""
+Local output checks, run by run-task's run_judge before any LLM judge.
+
+Every output goes through cheap, deterministic checks first:
+  errors    the output can't be used: too short, cut off (truncated at max_tokens, or an
+            unclosed code fence), a required heading or marker missing
+  warnings  the output might be wrong: placeholders from the agent's output template left in
+            (outside code), unusually large
+
+An error fails the task straight away, with no LLM call. Warnings escalate to the agent's LLM
+judge (agents/judge-{agent}/prompt.md) if it has one, and otherwise only get printed. AGENT_JUDGE
+controls the escalation:
+  auto     (default) run the LLM judge only when local checks raise warnings
+  always   run the LLM judge on every output that passes the local checks
+  off      local checks only
+"""
+import os
+import re
+from pathlib import Path
+
+JUDGE_MODES = ('auto', 'always', 'off')
+
+# Per-agent rules. headings: `#` lines that must exist (case-insensitive substring match).
+# any_of: at least one of these strings must appear. Tasks with `sections` (pipeline.yml)
+# also require every section heading.
+RULES = {
+    'product-spec': {'min_chars': 800},
+    'tech-lead': {'min_chars': 300, 'any_of': ['READY FOR IMPLEMENTATION', 'Questions']},
+    'foundation-architect': {'min_chars': 1000, 'headings': ['Executive Summary', 'Foundation Elements']},
+    'appsec': {'min_chars': 1000, 'headings': ['Executive Summary']},
+    'qa': {'min_chars': 1000, 'headings': ['Test Strategy']},
+    'engineering-spec': {'min_chars': 1000, 'headings': ['Overview', 'Data Model', 'API Endpoints']},
+    'spec-judge': {'min_chars': 300, 'headings': ['Summary'], 'any_of': ['BLOCKERS FOUND', 'CLEAN']},
+    'implementation-guide': {'min_chars': 1000, 'headings': ['Implementation order']},
+}
+DEFAULT_RULES = {'min_chars': 200}
+MAX_CHARS = 400_000  # ~100k tokens: far beyond any expected document, usually a generation loop
+PLACEHOLDER_RE = re.compile(r'\[[A-Z][^\[\]\n]+\](?!\()')  # [EntityName], [Current date]: not [X] or [text](link)
+CODE_RE = re.compile(r'```.*?```|`[^`\n]*`', re.DOTALL)
+
+_placeholders = {}  # agent -> placeholder tokens of its prompt template
+
+
+def judge_mode():
+    mode = os.environ.get('AGENT_JUDGE', 'auto').lower()
+    if mode not in JUDGE_MODES:
+        raise ValueError(f"Unknown AGENT_JUDGE '{mode}' (expected one of: {', '.join(JUDGE_MODES)})")
+    return mode
+
+
+def rules_for(agent, sections=None):
+    rules = dict(RULES.get(agent, DEFAULT_RULES))
+    headings = list(rules.get('headings', []))
+    rules['headings'] = headings + [s for s in sections or [] if s not in headings]
+    return rules
+
+
+def template_placeholders(agent):
+    """The placeholder tokens agents/{agent}/prompt.md uses in its output template. Only these are
+    flagged, so bracketed content such as C# attributes ([Authorize]) or UI labels ([Cancel]) isn't.
+    One-word tokens ([Name], [Date]) are left out too: documents use them in message templates."""
+    if agent not in _placeholders:
+        path = Path(f'agents/{agent}/prompt.md')
+        tokens = PLACEHOLDER_RE.findall(path.read_text()) if path.exists() else []
+        _placeholders[agent] = {token for token in tokens if ' ' in token or re.search(r'[a-z][A-Z]', token)}
+    return _placeholders[agent]
+
+
+def check(agent, text, sections=None, truncated=False):
+    """Run the local checks. Returns (errors, warnings) as lists of human-readable strings."""
+    rules = rules_for(agent, sections)
+    errors, warnings = [], []
+
+    if truncated:
+        errors.append("output was cut off at max_tokens and could not be completed")
+    if text.count('```') % 2:
+        errors.append("output ends inside an unclosed code block (likely truncated)")
+    if len(text) < rules.get('min_chars', 0):
+        errors.append(f"output is only {len(text):,} characters (expected at least {rules['min_chars']:,})")
+    if len(text) > MAX_CHARS:
+        warnings.append(f"output is {len(text):,} characters, far larger than expected")
+
+    headings = [line.lstrip('#').strip().lower() for line in text.splitlines() if line.startswith('#')]
+    for heading in rules['headings']:
+        if not any(heading.lower() in line for line in headings):
+            errors.append(f"missing required heading '{heading}'")
+    if rules.get('any_of') and not any(marker in text for marker in rules['any_of']):
+        errors.append(f"missing an expected marker (one of: {', '.join(rules['any_of'])})")
+
+    prose = CODE_RE.sub('', text)
+    placeholders = sorted(set(PLACEHOLDER_RE.findall(prose)) & template_placeholders(agent))
+    if placeholders:
+        shown = ', '.join(placeholders[:5]) + (f" +{len(placeholders) - 5} more" if len(placeholders) > 5 else '')
+        warnings.append(f"template placeholders left in the output: {shown}")
+    return errors, warnings